@@ -6,17 +6,42 @@ Exposes memory-aware agent functionality as REST API endpoints
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+import asyncio
+import contextvars
+import json
 import logging
 import os
 import re
+import threading
+import time
+import weakref
 from pathlib import Path
-from contextlib import asynccontextmanager
-from memory_agent import create_memory_agent
+from contextlib import aclosing, asynccontextmanager
+from memory_agent import create_memory_agent, get_agent_registry, run_agent_turn, stream_agent_turn
 from memory_config import get_memory
+from tool_runtime import io_queue_depth, tool_timings
+from fast_path import FAST_PATH_ENABLED, match_intent, run_fast_path
+from request_coalescer import RequestCoalescer, request_key
+from memory_index import SEARCH_MODES, format_memory_context, get_keyword_index, search_memories
+from mcp_diagram_client import running_mcp_clients
+from s3_inventory import inventory_queue_depth
+from metrics import (METRICS_ENABLED, CACHED_AGENTS, MCP_SUBPROCESSES, QUEUE_DEPTH, REQUEST_SECONDS,
+                     render_latest, timed)
+from tracing import span, traced
+from diagram_generator import shutdown_render_pool, warm_render_pool
+from diagram_cache import get_render_cache
+from diagram_store import DIAGRAM_ID_RE, VARIANTS, DiagramStore
+from diagram_retention import DIAGRAM_SWEEP_ENABLED, run_sweeper
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -36,30 +61,113 @@ class ChatResponse(BaseModel):
     success: bool
     user_id: str
     diagram_path: Optional[str] = None
+    diagram_variants: Optional[Dict[str, str]] = None  # png, svg, thumbnail URLs
+    usage: Optional[Dict[str, Any]] = None
 
 class MemoryRequest(BaseModel):
     user_id: Optional[str] = "default"
     query: Optional[str] = None
+    mode: Optional[str] = "vector"
 
 class MemoryResponse(BaseModel):
     memories: List[Dict[str, Any]]
     success: bool
 
+# Pre-retrieval of memories for each turn
+MEMORY_PREFETCH = os.getenv("MEMORY_PREFETCH", "true").lower() == "true"
+MEMORY_PREFETCH_TOP_K = int(os.getenv("MEMORY_PREFETCH_TOP_K", "5"))
+MEMORY_PREFETCH_MAX_CHARS = int(os.getenv("MEMORY_PREFETCH_MAX_CHARS", "1500"))
+
+DIAGRAM_KEYWORDS = ['diagram', 'architecture', 'draw', 'visualize']
+# Start diagram render workers at startup instead of on the first render
+DIAGRAM_WARM_WORKERS = os.getenv("DIAGRAM_WARM_WORKERS", "true").lower() == "true"
+
+# Response compression: brotli when brotli-asgi is installed (gzip for clients without br), else gzip
+API_COMPRESSION = os.getenv("API_COMPRESSION", "true").lower() == "true"
+API_COMPRESSION_MIN_BYTES = int(os.getenv("API_COMPRESSION_MIN_BYTES", "1000"))
+# Compressors buffer streamed bodies, which would hold events back until the turn ends
+UNCOMPRESSED_PATHS = ("/chat/stream",)
+# Formats that are already compressed; recompressing them costs CPU for no gain
+PRECOMPRESSED_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp",
+                       "application/zip", "application/gzip", "application/x-gzip", "font/woff2")
+
 # Initialize memory and agents
 memory = get_memory()
 agents = {}  # Store agents per user
+agents_lock = threading.Lock()
+# One turn at a time per user: turns share the user's Agent (history, routed model)
+turn_locks = weakref.WeakValueDictionary()
+coalescer = RequestCoalescer()  # Shares in-flight turns between duplicate submissions
+
+# Gauges are sampled when /metrics is scraped
+CACHED_AGENTS.set_function(lambda: len(agents))
+MCP_SUBPROCESSES.set_function(running_mcp_clients)
+QUEUE_DEPTH.labels(queue="tool_io").set_function(io_queue_depth)
+QUEUE_DEPTH.labels(queue="s3_inventory").set_function(inventory_queue_depth)
+QUEUE_DEPTH.labels(queue="chat_in_flight").set_function(coalescer.in_flight)
 
 # Create diagrams directory
 DIAGRAMS_DIR = Path("diagrams")
 DIAGRAMS_DIR.mkdir(exist_ok=True)
 (DIAGRAMS_DIR / "generated-diagrams").mkdir(exist_ok=True)
+diagram_store = DiagramStore(DIAGRAMS_DIR / "generated-diagrams")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler"""
+    get_agent_registry()
+    if DIAGRAM_WARM_WORKERS:
+        try:
+            await asyncio.to_thread(warm_render_pool)
+        except Exception as e:
+            logger.warning(f"Could not start diagram render workers: {e}")
+    sweeper = None
+    if DIAGRAM_SWEEP_ENABLED:
+        sweeper = asyncio.create_task(run_sweeper(DIAGRAMS_DIR, get_memory, lambda: list(agents)))
     logger.info("Memory-enabled Strands agent API initialized successfully")
     yield
     logger.info("Shutting down API")
+    if sweeper:
+        sweeper.cancel()
+    shutdown_render_pool()
+
+class SelectiveCompression:
+    """Compresses responses except on UNCOMPRESSED_PATHS and for PRECOMPRESSED_TYPES"""
+
+    def __init__(self, app, minimum_size: int = API_COMPRESSION_MIN_BYTES):
+        self.app = app
+        # The client-facing send of the current request, for responses that skip the compressor
+        self._raw_send = contextvars.ContextVar("raw_send")
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(self._route, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(self._route, minimum_size=minimum_size)
+
+    async def _route(self, scope, receive, send):
+        """Run the app under the compressor; already-compressed responses bypass it"""
+        raw_send = self._raw_send.get()
+        target = send
+
+        async def route(message):
+            nonlocal target
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", ()))
+                content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+                if content_type in PRECOMPRESSED_TYPES:
+                    target = raw_send
+            await target(message)
+
+        await self.app(scope, receive, route)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in UNCOMPRESSED_PATHS:
+            token = self._raw_send.set(send)
+            try:
+                await self.compressed(scope, receive, send)
+            finally:
+                self._raw_send.reset(token)
+        else:
+            await self.app(scope, receive, send)
 
 app = FastAPI(title="Memory-Enabled Strands Agent API", version="2.0.0", lifespan=lifespan)
 
@@ -75,12 +183,225 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if API_COMPRESSION:
+    app.add_middleware(SelectiveCompression)
+
+@traced("agent.get_or_create")
 def get_or_create_agent(user_id: str):
     """Get existing agent for user or create new one"""
-    if user_id not in agents:
-        agents[user_id] = create_memory_agent(user_id)
-        logger.info(f"Created new agent for user: {user_id}")
-    return agents[user_id]
+    with agents_lock:
+        if user_id not in agents:
+            agents[user_id] = create_memory_agent(user_id)
+            logger.info(f"Created new agent for user: {user_id}")
+        return agents[user_id]
+
+@traced("memory.prefetch")
+def build_turn_context(message: str, user_id: str) -> str:
+    """
+    Fetch memories relevant to this turn and render them under a size budget
+    
+    Lets the agent answer personal questions without a search_memory round
+    trip; the tool stays available for follow-ups.
+    """
+    sections = []
+    seen = set()
+    try:
+        # Diagram requests also get previous diagram context
+        if any(keyword in message.lower() for keyword in DIAGRAM_KEYWORDS):
+            prev_diagrams = search_memories(memory, "diagram architecture", user_id=user_id, limit=3)
+            if prev_diagrams:
+                seen.update(str(m['id']) for m in prev_diagrams)
+                context = "\n".join([m['memory'] for m in prev_diagrams])
+                sections.append(f"Previous diagram context: {context}")
+        
+        if MEMORY_PREFETCH:
+            relevant = search_memories(memory, message, user_id=user_id,
+                                       limit=MEMORY_PREFETCH_TOP_K, mode="hybrid")
+            relevant = [m for m in relevant if str(m['id']) not in seen]
+            context = format_memory_context(relevant, MEMORY_PREFETCH_MAX_CHARS)
+            if context:
+                sections.append(f"Relevant memories (already retrieved, no need to search again):\n{context}")
+    except Exception as e:
+        logger.warning(f"Memory pre-retrieval failed for {user_id}: {e}")
+    return "\n\n".join(sections)
+
+def turn_lock(user_id: str) -> asyncio.Lock:
+    """Lock serializing turns on a user's agent (dropped once no turn holds or waits on it)"""
+    lock = turn_locks.get(user_id)
+    if lock is None:
+        lock = turn_locks[user_id] = asyncio.Lock()
+    return lock
+
+async def prepare_turn(message: str, user_id: str):
+    """Create or fetch the agent while memories are retrieved in parallel"""
+    agent, context = await asyncio.gather(
+        asyncio.to_thread(get_or_create_agent, user_id),
+        asyncio.to_thread(build_turn_context, message, user_id)
+    )
+    query = f"{message}\n\n{context}" if context else message
+    return agent, query
+
+async def run_chat_turn(message: str, user_id: str):
+    """
+    Run one chat turn, answering deterministic utility intents without the LLM
+    
+    Returns:
+        tuple: (response text, usage dict)
+    """
+    async with turn_lock(user_id):
+        if FAST_PATH_ENABLED and match_intent(message):
+            agent = await asyncio.to_thread(get_or_create_agent, user_id)
+            reply = await asyncio.to_thread(run_fast_path, agent, message)
+            if reply is not None:
+                return reply, {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                               "llm_calls": 0, "model": "fast-path"}
+        
+        agent, query = await prepare_turn(message, user_id)
+        result, usage = await asyncio.to_thread(run_agent_turn, agent, query, message)
+    
+    if hasattr(result, 'text'):
+        response = result.text
+    elif hasattr(result, 'content'):
+        response = result.content
+    else:
+        response = str(result)
+    
+    response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL).strip()
+    return response, usage
+
+def diagram_url(path: Path) -> str:
+    """Static URL for a file under the diagrams directory"""
+    return f"/diagrams/{path.relative_to(DIAGRAMS_DIR).as_posix()}"
+
+def find_diagram(response: str, user_id: str) -> Dict[str, str]:
+    """
+    Resolve the diagram a response refers to, as variant name -> URL
+    
+    Store IDs map straight to their user/date shard; bare file names from
+    the MCP server are checked in the two flat directories (PNG only).
+    """
+    for diagram_id in dict.fromkeys(m.group(0) for m in DIAGRAM_ID_RE.finditer(response)):
+        variants = diagram_store.variants(user_id, diagram_id)
+        if "png" in variants:
+            logger.info(f"Found diagram at: {variants['png']}")
+            return {name: diagram_url(path) for name, path in variants.items()}
+    
+    diagram_match = re.search(r'(diagram_[\w]+\.png)', response)
+    if diagram_match:
+        diagram_filename = diagram_match.group(1)
+        for path in (DIAGRAMS_DIR / "generated-diagrams" / diagram_filename, DIAGRAMS_DIR / diagram_filename):
+            if path.is_file():
+                logger.info(f"Found diagram at: {path}")
+                return {"png": diagram_url(path)}
+    return {}
+
+class ThinkingFilter:
+    """Drops <thinking>...</thinking> from streamed text, including tags split across chunks"""
+    
+    OPEN, CLOSE = "<thinking>", "</thinking>"
+    
+    def __init__(self):
+        self.buffer = ""
+        self.inside = False
+    
+    def feed(self, text: str) -> str:
+        """Visible part of the text seen so far that can no longer be part of a tag"""
+        self.buffer += text
+        visible = []
+        while True:
+            tag = self.CLOSE if self.inside else self.OPEN
+            index = self.buffer.find(tag)
+            if index < 0:
+                break
+            if not self.inside:
+                visible.append(self.buffer[:index])
+            self.buffer = self.buffer[index + len(tag):]
+            self.inside = not self.inside
+        # Hold back a trailing partial tag until the next chunk decides it
+        keep = next((n for n in range(min(len(tag) - 1, len(self.buffer)), 0, -1)
+                     if tag.startswith(self.buffer[-n:])), 0)
+        if not self.inside:
+            visible.append(self.buffer[:len(self.buffer) - keep])
+        self.buffer = self.buffer[len(self.buffer) - keep:]
+        return "".join(visible)
+    
+    def flush(self) -> str:
+        text = "" if self.inside else self.buffer
+        self.buffer = ""
+        return text
+
+def stream_event(event_type: str, **fields) -> str:
+    """One NDJSON line of the /chat/stream protocol"""
+    return json.dumps({"type": event_type, **fields}) + "\n"
+
+async def chat_events(message: str, user_id: str):
+    """
+    Run a chat turn and yield /chat/stream events as NDJSON lines:
+    text (reply chunks), tool_start / tool_end (tool progress), diagram
+    (artifact variants as soon as a tool produces them), error, and a
+    final done with the full message, diagram variants and usage.
+    The user's turn lock is held until the turn ends or the client leaves.
+    """
+    async with turn_lock(user_id):
+        async with aclosing(turn_events(message, user_id)) as events:
+            async for line in events:
+                yield line
+
+async def turn_events(message: str, user_id: str):
+    """Events of one chat turn (see chat_events); the caller holds the turn lock"""
+    if FAST_PATH_ENABLED and match_intent(message):
+        agent = await asyncio.to_thread(get_or_create_agent, user_id)
+        reply = await asyncio.to_thread(run_fast_path, agent, message)
+        if reply is not None:
+            yield stream_event("text", data=reply)
+            yield stream_event("done", message=reply, diagram_variants=None,
+                               usage={"input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                                      "llm_calls": 0, "model": "fast-path"})
+            return
+    
+    agent, query = await prepare_turn(message, user_id)
+    thinking = ThinkingFilter()
+    tools = {}  # toolUseId -> (name, start time)
+    diagram_variants = {}
+    result, usage = None, None
+    async with aclosing(stream_agent_turn(agent, query, message)) as events:
+        async for event in events:
+            if "data" in event:
+                text = thinking.feed(event["data"])
+                if text:
+                    yield stream_event("text", data=text)
+            elif "current_tool_use" in event:
+                tool_use = event["current_tool_use"]
+                tool_use_id = tool_use.get("toolUseId")
+                if tool_use_id and tool_use_id not in tools:
+                    tools[tool_use_id] = (tool_use.get("name"), time.perf_counter())
+                    yield stream_event("tool_start", id=tool_use_id, tool=tool_use.get("name"))
+            elif "message" in event and event["message"].get("role") == "user":
+                for block in event["message"].get("content", []):
+                    tool_result = block.get("toolResult")
+                    if not tool_result:
+                        continue
+                    name, start = tools.get(tool_result["toolUseId"], (None, time.perf_counter()))
+                    yield stream_event("tool_end", id=tool_result["toolUseId"], tool=name,
+                                       status=tool_result.get("status"), seconds=round(time.perf_counter() - start, 2))
+                    output = " ".join(item.get("text", "") for item in tool_result.get("content", []))
+                    variants = find_diagram(output, user_id)
+                    if variants and variants != diagram_variants:
+                        diagram_variants = variants
+                        yield stream_event("diagram", variants=variants)
+            elif "result" in event:
+                result, usage = event["result"], event["usage"]
+    
+    tail = thinking.flush()
+    if tail:
+        yield stream_event("text", data=tail)
+    response = re.sub(r'<thinking>.*?</thinking>', '', str(result or ''), flags=re.DOTALL).strip()
+    # MCP-rendered diagrams may only be named in the final reply
+    variants = find_diagram(response, user_id)
+    if variants and variants != diagram_variants:
+        diagram_variants = variants
+        yield stream_event("diagram", variants=variants)
+    yield stream_event("done", message=response, diagram_variants=diagram_variants or None, usage=usage)
 
 @app.get("/")
 async def root():
@@ -102,62 +423,17 @@ async def chat(request: ChatRequest):
         if latest_message.role != "user":
             raise HTTPException(status_code=400, detail="Last message must be from user")
         
-        agent = get_or_create_agent(user_id)
-        
-        # Check if this is a diagram-related request
-        is_diagram_request = any(keyword in latest_message.content.lower() 
-                                for keyword in ['diagram', 'architecture', 'draw', 'visualize'])
-        
-        # If diagram request, include previous diagram context from memory
-        if is_diagram_request:
-            prev_diagrams = memory.search("diagram architecture", user_id=user_id, limit=3)
-            if prev_diagrams and isinstance(prev_diagrams, dict):
-                prev_diagrams = prev_diagrams.get('results', [])
-            if prev_diagrams:
-                context = "\n".join([m['memory'] for m in prev_diagrams])
-                enhanced_query = f"{latest_message.content}\n\nPrevious diagram context: {context}"
-                result = agent(enhanced_query)
-            else:
-                result = agent(latest_message.content)
-        else:
-            result = agent(latest_message.content)
-        
-        if hasattr(result, 'text'):
-            response = result.text
-        elif hasattr(result, 'content'):
-            response = result.content
-        else:
-            response = str(result)
-        
-        response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL).strip()
-        
-        # Check if response contains diagram path
-        diagram_path = None
-        path_patterns = [
-            r'generated-diagrams/(diagram_[\w]+\.png)',
-            r'(diagram_[\w]+\.png)'
-        ]
-        
-        for pattern in path_patterns:
-            diagram_match = re.search(pattern, response)
-            if diagram_match:
-                diagram_filename = diagram_match.group(1)
-                
-                # Check in generated-diagrams subdirectory
-                subdir_path = DIAGRAMS_DIR / "generated-diagrams" / diagram_filename
-                if subdir_path.exists():
-                    diagram_path = f"/diagrams/generated-diagrams/{diagram_filename}"
-                    logger.info(f"Found diagram at: {subdir_path}")
-                    logger.info(f"Returning diagram_path: {diagram_path}")
-                    break
-                
-                # Check in main diagrams directory
-                if (DIAGRAMS_DIR / diagram_filename).exists():
-                    diagram_path = f"/diagrams/{diagram_filename}"
-                    break
+        with timed(REQUEST_SECONDS, endpoint="/chat"), span("chat.request", endpoint="/chat", user_id=user_id):
+            response, usage = await coalescer.run(
+                request_key(user_id, latest_message.content),
+                lambda: run_chat_turn(latest_message.content, user_id)
+            )
         
+        diagram_variants = find_diagram(response, user_id)
+        diagram_path = diagram_variants.get("png")
         logger.info(f"Final diagram_path: {diagram_path}")
-        return ChatResponse(message=response, success=True, user_id=user_id, diagram_path=diagram_path)
+        return ChatResponse(message=response, success=True, user_id=user_id, diagram_path=diagram_path,
+                            diagram_variants=diagram_variants or None, usage=usage)
         
     except Exception as e:
         logger.error(f"Error processing chat: {str(e)}")
@@ -165,54 +441,76 @@ async def chat(request: ChatRequest):
 
 @app.post("/chat/stream")
 async def chat_stream(request: ChatRequest):
-    """Stream chat responses"""
-    from fastapi.responses import StreamingResponse
-    import asyncio
+    """
+    Stream a chat turn as NDJSON events while it runs (see chat_events).
+    Identical in-flight requests share one turn; it is cancelled once
+    every client watching it has disconnected.
+    """
+    if not request.messages or request.messages[-1].role != "user":
+        raise HTTPException(status_code=400, detail="Last message must be from user")
+    user_id = request.user_id or "default"
+    message = request.messages[-1].content
     
     async def generate():
         try:
-            user_id = request.user_id or "default"
-            latest_message = request.messages[-1]
-            agent = get_or_create_agent(user_id)
-            result = agent(latest_message.content)
-            
-            if hasattr(result, 'text'):
-                response = result.text
-            elif hasattr(result, 'content'):
-                response = result.content
-            else:
-                response = str(result)
-            
-            import re
-            response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL).strip()
-            
-            # Stream word by word
-            for word in response.split():
-                yield f"{word} "
-                await asyncio.sleep(0.05)
+            with timed(REQUEST_SECONDS, endpoint="/chat/stream"), \
+                    span("chat.request", endpoint="/chat/stream", user_id=user_id):
+                # Duplicate submits attach to the stream already running for this message
+                shared = coalescer.stream(request_key(user_id, message), lambda: chat_events(message, user_id))
+                async with aclosing(shared) as lines:
+                    async for line in lines:
+                        yield line
+        except asyncio.CancelledError:
+            logger.info(f"Client disconnected; cancelled chat turn for {user_id}")
+            raise
         except Exception as e:
-            yield f"Error: {str(e)}"
+            logger.error(f"Error streaming chat: {str(e)}")
+            yield stream_event("error", detail=str(e))
     
-    return StreamingResponse(generate(), media_type="text/plain")
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "memory_ready": True, "active_users": len(agents)}
+    return {"status": "healthy", "memory_ready": True, "active_users": len(agents),
+            "tool_timings": tool_timings.snapshot(),
+            "model_latency": get_agent_registry().router.latency_snapshot(),
+            "requests": coalescer.stats(),
+            "diagram_cache": get_render_cache().stats() if get_render_cache() else None}
+
+@app.get("/diagram/{user_id}/{diagram_id}")
+async def get_diagram(user_id: str, diagram_id: str, variant: str = "png"):
+    """Fetch a diagram by ID; variant is png, svg or thumbnail"""
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Invalid variant: {variant}")
+    path = diagram_store.resolve(user_id, diagram_id, VARIANTS[variant])
+    if path is None:
+        raise HTTPException(status_code=404, detail="Diagram not found")
+    return FileResponse(path, media_type="image/svg+xml" if variant == "svg" else "image/png")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 @app.post("/memory", response_model=MemoryResponse)
 async def get_memories(request: MemoryRequest):
     """
     Retrieve user memories
     """
+    if request.mode and request.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid search mode: {request.mode}")
+    
     try:
         user_id = request.user_id or "default"
         
         if request.query:
             # Search specific memories
-            result = memory.search(request.query, user_id=user_id, limit=100)
-            # Handle dict response with 'results' key
-            memories = result.get('results', []) if isinstance(result, dict) else result
+            memories = search_memories(memory, request.query, user_id=user_id, limit=100,
+                                       mode=request.mode or "vector")
         else:
             # Get all memories
             result = memory.get_all(user_id=user_id)
@@ -236,6 +534,7 @@ async def clear_memories(user_id: str):
         if memories:
             for mem in memories:
                 memory.delete(mem['id'])
+        get_keyword_index(memory).drop(user_id)
         
         # Remove agent instance
         if user_id in agents:
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Shared AWS Clients
+Process-wide boto3 session/clients and TTL caching of slow-changing results
+"""
+
+import os
+import threading
+import time
+import boto3
+from typing import Any, Callable, Dict, Hashable, Optional
+
+AWS_CACHE_TTL = float(os.getenv("AWS_CACHE_TTL", "300"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl: float = AWS_CACHE_TTL):
+        self.ttl = ttl
+        self._data: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live cached value or default"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, computing and caching it on a miss (errors are not cached)"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or everything when no key is given"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+_session = None
+_clients: Dict[tuple, Any] = {}
+_client_lock = threading.Lock()
+
+result_cache = TTLCache()
+
+
+def get_session() -> boto3.Session:
+    """Get the shared boto3 session"""
+    global _session
+    if _session is None:
+        with _client_lock:
+            if _session is None:
+                _session = boto3.Session()
+    return _session
+
+
+def get_client(service: str, region_name: Optional[str] = None):
+    """Get a cached boto3 client (clients are thread-safe, creation is not)"""
+    key = (service, region_name)
+    client = _clients.get(key)
+    if client is None:
+        session = get_session()
+        with _client_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = session.client(service, region_name=region_name)
+                _clients[key] = client
+    return client
+
+
+def get_region() -> str:
+    """Region of the shared session"""
+    return get_session().region_name or 'Unknown'
+
+
+def get_account_id(refresh: bool = False) -> str:
+    """Account ID of the current credentials, cached per region"""
+    key = ("account_id", get_region())
+    if refresh:
+        result_cache.invalidate(key)
+    return result_cache.get_or_compute(
+        key,
+        lambda: get_client('sts').get_caller_identity().get('Account', 'Unknown')
+    )
+
+
+def cached_result(name: str, compute: Callable[[], Any], refresh: bool = False) -> Any:
+    """Cache a result keyed by account, region and name"""
+    key = (get_account_id(), get_region(), name)
+    if refresh:
+        result_cache.invalidate(key)
+    return result_cache.get_or_compute(key, compute)
+
+
+def invalidate_aws_cache(reset_clients: bool = False):
+    """Drop cached AWS results, and optionally the session/clients (e.g. after credential rotation)"""
+    global _session
+    result_cache.invalidate()
+    if reset_clients:
+        with _client_lock:
+            _clients.clear()
+            _session = None
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark Per-User Agent Construction
+Tracks creation time and retained memory per agent for the shared registry
+path versus building every agent from scratch
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+from strands import Agent
+from strands_tools import calculator, current_time
+import memory_agent
+from memory_agent import create_memory_agent, get_agent_registry
+
+
+def create_legacy_agent(user_id: str) -> Agent:
+    """Build an agent the pre-registry way: fresh tools, prompt and model client"""
+    tools = [
+        calculator,
+        current_time,
+        memory_agent.search_memory,
+        memory_agent.save_memory,
+        memory_agent.aws_account_info,
+        memory_agent.s3_inventory
+    ]
+    diagrams_dir = os.path.abspath("diagrams")
+    system_prompt = memory_agent.SYSTEM_PROMPT_TEMPLATE.replace(
+        "{diagrams_dir}", diagrams_dir).replace("{user_id}", user_id)
+    return Agent(tools=tools, model=memory_agent.MODEL_ID, system_prompt=system_prompt)
+
+
+def measure(factory, count: int):
+    """Return (per-agent creation times in ms, retained bytes per agent)"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    agents = []
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        agents.append(factory(f"bench_user_{i}"))
+        timings.append((time.perf_counter() - start) * 1000)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return timings, retained / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-user agent creation")
+    parser.add_argument("--count", type=int, default=200, help="Agents to create per path")
+    args = parser.parse_args()
+
+    # Build the registry (and its one-off costs) before timing
+    start = time.perf_counter()
+    get_agent_registry()
+    print(f"Registry build: {(time.perf_counter() - start) * 1000:.1f} ms (one-off)")
+
+    print(f"\n{'path':<10} {'mean ms':>9} {'p95 ms':>9} {'KiB/agent':>11}")
+    print("-" * 42)
+    for name, factory in (("legacy", create_legacy_agent), ("registry", create_memory_agent)):
+        timings, per_agent = measure(factory, args.count)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{name:<10} {statistics.mean(timings):>9.3f} {p95:>9.3f} {per_agent / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
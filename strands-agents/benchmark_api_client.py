@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark API Client Round Trips
+Compares a new connection per call (top-level requests.get) with the
+pooled keep-alive session the Streamlit client uses, against a running API
+"""
+
+import argparse
+import statistics
+import time
+import requests
+from http_session import create_http_session
+
+API_BASE_URL = "http://localhost:8000"
+
+
+def timed_calls(get, url: str, calls: int):
+    latencies, sizes = [], []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = get(url, timeout=30)
+        response.raise_for_status()
+        response.content
+        latencies.append(time.perf_counter() - start)
+        # Bytes on the wire when the response was compressed
+        sizes.append(int(response.headers.get("Content-Length", len(response.content))))
+    return latencies, sizes, response.headers.get("Content-Encoding", "identity")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call connections against a pooled session")
+    parser.add_argument("--url", default=API_BASE_URL, help="API base URL")
+    parser.add_argument("--endpoint", default="/health", help="GET endpoint to call")
+    parser.add_argument("--calls", type=int, default=50, help="Calls per client")
+    args = parser.parse_args()
+
+    url = f"{args.url}{args.endpoint}"
+    session = create_http_session()
+    session.get(url, timeout=30)  # open the pooled connection up front
+    clients = {"per-call": requests.get, "pooled": session.get}
+
+    print(f"{'client':<10} {'median ms':>10} {'p95 ms':>8} {'bytes':>7} {'encoding':>9}")
+    print("-" * 48)
+    for name, get in clients.items():
+        latencies, sizes, encoding = timed_calls(get, url, args.calls)
+        latencies.sort()
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        print(f"{name:<10} {statistics.median(latencies) * 1000:>10.2f} {p95 * 1000:>8.2f} "
+              f"{statistics.median(sizes):>7.0f} {encoding:>9}")
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
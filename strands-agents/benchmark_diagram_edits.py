@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark Iterative Diagram Edits
+Compares "add DynamoDB to the previous diagram" done as an update_diagram
+patch against regenerating the whole diagram script
+"""
+
+import argparse
+import json
+import statistics
+import time
+from diagram_model import DiagramModel
+
+BASE_OPERATIONS = [
+    {"op": "set_title", "title": "Serverless Web App"},
+    {"op": "add_cluster", "id": "edge", "label": "Edge"},
+    {"op": "add_cluster", "id": "backend", "label": "Backend"},
+    {"op": "add_node", "id": "users", "type": "Users", "label": "Users"},
+    {"op": "add_node", "id": "cdn", "type": "CloudFront", "label": "CDN", "cluster": "edge"},
+    {"op": "add_node", "id": "site", "type": "S3", "label": "Static Site", "cluster": "edge"},
+    {"op": "add_node", "id": "api", "type": "APIGateway", "label": "API", "cluster": "backend"},
+    {"op": "add_node", "id": "fn", "type": "Lambda", "label": "Handler", "cluster": "backend"},
+    {"op": "add_node", "id": "auth", "type": "Cognito", "label": "Auth", "cluster": "backend"},
+    {"op": "connect", "source": "users", "target": "cdn"},
+    {"op": "connect", "source": "cdn", "target": "site"},
+    {"op": "connect", "source": "cdn", "target": "api"},
+    {"op": "connect", "source": "api", "target": "auth", "label": "authorize"},
+    {"op": "connect", "source": "api", "target": "fn"},
+]
+EDIT_OPERATIONS = [
+    {"op": "add_node", "id": "db", "type": "Dynamodb", "label": "Orders", "cluster": "backend"},
+    {"op": "connect", "source": "fn", "target": "db", "label": "writes"},
+]
+EDIT_REQUEST = "Add a DynamoDB table called Orders to my previous diagram and have the Lambda write to it"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough output-token estimate (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def build(operations) -> DiagramModel:
+    model = DiagramModel()
+    for operation in operations:
+        model.apply(operation)
+    return model
+
+
+def offline():
+    """Output the LLM must generate for the edit on each path"""
+    code = build(BASE_OPERATIONS + EDIT_OPERATIONS).to_code()
+    patch = json.dumps(EDIT_OPERATIONS)
+    print("Generated output per edit (estimated tokens)")
+    print(f"  full script: {estimate_tokens(code):>5} ({len(code)} chars)")
+    print(f"  patch:       {estimate_tokens(patch):>5} ({len(patch)} chars)")
+
+
+def live(repeats: int, previous_code: str):
+    """Run both paths through the agent and report measured tokens and latency"""
+    from diagram_model import get_diagram_model_store
+    from memory_agent import create_memory_agent, run_agent_turn
+
+    user_id = "benchmark_diagram_edits"
+    store = get_diagram_model_store()
+    prompts = {
+        "patch": f"{EDIT_REQUEST}. Use update_diagram.",
+        "regenerate": (f"{EDIT_REQUEST}. Previous diagram code:\n{previous_code}\n"
+                       "Write the complete updated code and render it with the generate_diagram tool."),
+    }
+
+    print(f"\n{'path':<12} {'latency s':>10} {'input tok':>10} {'output tok':>11} {'LLM calls':>10}")
+    print("-" * 57)
+    for name, prompt in prompts.items():
+        latencies, usages = [], []
+        for _ in range(repeats):
+            store.save(user_id, build(BASE_OPERATIONS))
+            agent = create_memory_agent(user_id)
+            start = time.perf_counter()
+            _, usage = run_agent_turn(agent, prompt)
+            latencies.append(time.perf_counter() - start)
+            usages.append(usage)
+        print(f"{name:<12} {statistics.median(latencies):>10.1f} "
+              f"{statistics.median(u['input_tokens'] for u in usages):>10.0f} "
+              f"{statistics.median(u['output_tokens'] for u in usages):>11.0f} "
+              f"{statistics.median(u['llm_calls'] for u in usages):>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark iterative diagram edits")
+    parser.add_argument("--live", action="store_true", help="Also run both paths through Bedrock")
+    parser.add_argument("--repeats", type=int, default=3, help="Live runs per path")
+    args = parser.parse_args()
+
+    offline()
+    if args.live:
+        live(args.repeats, build(BASE_OPERATIONS).to_code())
+
+
+if __name__ == "__main__":
+    main()
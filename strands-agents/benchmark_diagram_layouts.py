@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark Diagram Layout Engines
+Render time and peak memory of synthetic AWS architectures (5-500 nodes)
+per Graphviz layout engine, including the auto selection
+"""
+
+import argparse
+import multiprocessing
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from diagram_worker import DIAGRAM_TIMEOUT, RenderLimitError, layout_options, preload, render_job
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+NODE_TYPES = ("ELB", "EC2", "Lambda", "SQS", "ElastiCache", "RDS", "Dynamodb", "S3")
+CLUSTER_SIZE = 8
+
+
+def synthetic_architecture(nodes: int, seed: int = 0) -> str:
+    """
+    diagrams code for a multi-tier architecture: clusters of CLUSTER_SIZE
+    nodes wired as a chain, linked to the next cluster, plus random
+    cross-cluster edges (about 1.3 edges per node)
+    """
+    rng = random.Random(seed)
+    lines = [f"with Diagram('Synthetic {nodes} nodes', show=False):"]
+    names = [f"n{i}" for i in range(nodes)]
+    for start in range(0, nodes, CLUSTER_SIZE):
+        lines.append(f"    with Cluster('Service {start // CLUSTER_SIZE}'):")
+        for i in range(start, min(start + CLUSTER_SIZE, nodes)):
+            lines.append(f"        {names[i]} = {NODE_TYPES[i % len(NODE_TYPES)]}('{names[i]}')")
+    for i in range(1, nodes):
+        # Chain inside each cluster; the first node of a cluster hangs off the previous cluster's entry
+        source = i - 1 if i % CLUSTER_SIZE else i - CLUSTER_SIZE
+        lines.append(f"    {names[source]} >> {names[i]}")
+    for _ in range(int(nodes * 0.3)):
+        source, target = rng.sample(range(nodes), 2)
+        lines.append(f"    {names[source]} >> Edge(style='dashed') >> {names[target]}")
+    return "\n".join(lines) + "\n"
+
+
+def measure(code: str, engine: str, formats, timeout: float):
+    """One render in this (fresh) process; peak RSS of Graphviz and of the worker in MB, None past a limit"""
+    job_dir = tempfile.mkdtemp(prefix="bench-layout-")
+    try:
+        start = time.perf_counter()
+        try:
+            job = render_job(code, job_dir, True, formats, 0, layout_options(engine), timeout)
+        except RenderLimitError:
+            return None
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+    graphviz_mb = worker_mb = float("nan")
+    if resource is not None:
+        # ru_maxrss is in KB on Linux
+        graphviz_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        worker_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return elapsed, graphviz_mb, worker_mb, job["layout"].get("engine", engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Graphviz layout engines by graph size")
+    parser.add_argument("--sizes", default="5,25,50,100,250,500", help="Comma-separated node counts")
+    parser.add_argument("--engines", default="dot,fdp,sfdp,neato,auto", help="Comma-separated engines")
+    parser.add_argument("--repeats", type=int, default=3, help="Renders per size and engine")
+    parser.add_argument("--formats", default="png", help="Comma-separated output formats")
+    parser.add_argument("--timeout", type=float, default=max(DIAGRAM_TIMEOUT, 300), help="Seconds per render")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    formats = args.formats.split(",")
+    print(f"{'nodes':>6} {'edges':>6} {'engine':<12} {'median s':>9} {'max s':>8} {'graphviz MB':>12} {'worker MB':>10}")
+    print("-" * 69)
+    for nodes in (int(n) for n in args.sizes.split(",")):
+        code = synthetic_architecture(nodes)
+        edges = code.count(">>") - code.count("Edge(")
+        for engine in args.engines.split(","):
+            results = []
+            for _ in range(args.repeats):
+                # Fresh preloaded process per render so peak RSS belongs to this render alone
+                with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=preload) as pool:
+                    result = pool.submit(measure, code, engine, formats, args.timeout).result()
+                if result is None:
+                    break
+                results.append(result)
+            if not results:
+                print(f"{nodes:>6} {edges:>6} {engine:<12} {'limit':>9}")
+                continue
+            times = [r[0] for r in results]
+            label = engine if engine != "auto" else f"auto>{results[0][3]}"
+            print(f"{nodes:>6} {edges:>6} {label:<12} {statistics.median(times):>9.2f} {max(times):>8.2f} "
+                  f"{max(r[1] for r in results):>12.1f} {max(r[2] for r in results):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
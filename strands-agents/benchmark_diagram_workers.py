@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark Diagram Render Startup
+Per-render overhead of a fresh process per job versus preloaded render
+workers, with and without the prepended AWS import block
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from diagram_worker import AWS_MODULES, preload, render_job
+
+IMPORT_BLOCK = "from diagrams import Diagram, Cluster, Edge\n" + "".join(
+    f"from {name} import *\n" for name in AWS_MODULES)
+
+SAMPLE_CODE = '''
+with Diagram("Benchmark Serverless", show=False):
+    api = APIGateway("API")
+    fn = Lambda("Function")
+    db = Dynamodb("Database")
+    api >> fn >> db
+'''
+
+
+def run(pool_factory, code: str, aws_namespace: bool, renders: int):
+    """Return (wall ms per render, worker setup ms per render, worker exec ms per render)"""
+    wall, setup, execute = [], [], []
+    for _ in range(renders):
+        job_dir = tempfile.mkdtemp(prefix="bench-render-")
+        try:
+            pool, owned = pool_factory()
+            start = time.perf_counter()
+            job = pool.submit(render_job, code, job_dir, aws_namespace).result()
+            wall.append((time.perf_counter() - start) * 1000)
+            setup.append((job["preload_s"] + job["setup_s"]) * 1000)
+            execute.append(job["exec_s"] * 1000)
+            if owned:
+                pool.shutdown()
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+    return wall, setup, execute
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark diagram render worker startup")
+    parser.add_argument("--renders", type=int, default=10, help="Renders per path")
+    parser.add_argument("--start-method", default="spawn", help="multiprocessing start method")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context(args.start_method)
+
+    def fresh_process():
+        # One process per render, like shelling out to a renderer
+        return ProcessPoolExecutor(max_workers=1, mp_context=context), True
+
+    preloaded = ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=preload)
+    start = time.perf_counter()
+    preloaded.submit(preload).result()
+    print(f"Worker start + preload: {(time.perf_counter() - start) * 1000:.1f} ms (one-off)")
+
+    paths = (
+        ("fresh process", fresh_process, IMPORT_BLOCK + SAMPLE_CODE, False),
+        ("warm + imports", lambda: (preloaded, False), IMPORT_BLOCK + SAMPLE_CODE, False),
+        ("warm namespace", lambda: (preloaded, False), SAMPLE_CODE, True),
+    )
+    print(f"\n{'path':<16} {'wall ms':>9} {'p95 ms':>9} {'setup ms':>9} {'exec ms':>9}")
+    print("-" * 56)
+    for name, factory, code, aws_namespace in paths:
+        wall, setup, execute = run(factory, code, aws_namespace, args.renders)
+        wall.sort()
+        p95 = wall[max(int(len(wall) * 0.95) - 1, 0)]
+        print(f"{name:<16} {statistics.mean(wall):>9.1f} {p95:>9.1f} "
+              f"{statistics.mean(setup):>9.2f} {statistics.mean(execute):>9.1f}")
+    preloaded.shutdown()
+
+
+if __name__ == "__main__":
+    main()
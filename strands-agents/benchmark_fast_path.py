@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark Utility Intent Fast Path
+Compares latency of answering utility intents directly versus through the LLM
+"""
+
+import argparse
+import statistics
+import time
+from fast_path import run_fast_path
+from memory_agent import create_memory_agent, run_agent_turn
+
+PROMPTS = [
+    "Calculate 15 * 23",
+    "What's the current time?",
+    "Count the letter 'a' in banana",
+]
+
+
+def time_path(answer, prompt: str, repeats: int):
+    """Return latencies in ms for answering prompt repeats times on a fresh agent"""
+    agent = create_memory_agent("benchmark_fast_path")
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        answer(agent, prompt)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the utility intent fast path")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per prompt and path")
+    args = parser.parse_args()
+
+    def fast(agent, prompt):
+        if run_fast_path(agent, prompt) is None:
+            raise RuntimeError(f"Fast path did not match: {prompt}")
+
+    def llm(agent, prompt):
+        run_agent_turn(agent, prompt)
+
+    print(f"{'prompt':<34} {'fast ms':>10} {'LLM ms':>10} {'speedup':>9}")
+    print("-" * 66)
+    for prompt in PROMPTS:
+        fast_ms = statistics.median(time_path(fast, prompt, args.repeats))
+        llm_ms = statistics.median(time_path(llm, prompt, args.repeats))
+        print(f"{prompt:<34} {fast_ms:>10.2f} {llm_ms:>10.0f} {llm_ms / fast_ms:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
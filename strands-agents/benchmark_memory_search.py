@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark Memory Search Modes
+Compares accuracy and latency of vector, keyword and hybrid retrieval
+"""
+
+import argparse
+import statistics
+import time
+from memory_config import get_memory
+from memory_index import SEARCH_MODES, get_keyword_index, search_memories
+
+BENCH_USER = "benchmark_memory_search"
+
+# Facts seeded for the benchmark user
+FACTS = [
+    "User's name is Priya and she is called Pri by her team",
+    "User prefers Python over Java for backend work",
+    "User owns the S3 bucket acme-prod-logs.eu-west-1 for application logs",
+    "User stores ML training data in the bucket acme-ml-datasets",
+    "User's team runs payments on Amazon DynamoDB with on-demand capacity",
+    "User is migrating the orders service from EC2 to AWS Lambda",
+    "User likes hiking and landscape photography",
+    "User's favorite AWS service is Step Functions",
+    "User deploys the checkout-api through API Gateway and CloudFront",
+    "User is studying for the AWS Solutions Architect Professional exam",
+    "User dislikes long meetings and prefers async updates",
+    "User's staging Kinesis stream is named clickstream-staging",
+]
+
+# (query, substring expected in a relevant result)
+QUERIES = [
+    ("name called", "called Pri"),
+    ("acme-prod-logs.eu-west-1", "acme-prod-logs"),
+    ("which bucket has training data", "acme-ml-datasets"),
+    ("DynamoDB", "DynamoDB"),
+    ("serverless migration plans", "AWS Lambda"),
+    ("hobbies outdoors", "hiking"),
+    ("checkout-api", "checkout-api"),
+    ("certification goals", "Solutions Architect"),
+    ("clickstream-staging", "clickstream-staging"),
+    ("communication preferences", "async updates"),
+]
+
+
+def seed(memory):
+    """Store benchmark facts verbatim and index them"""
+    index = get_keyword_index(memory)
+    for fact in FACTS:
+        result = memory.add(fact, user_id=BENCH_USER, infer=False)
+        index.apply_add_result(BENCH_USER, result)
+
+
+def cleanup(memory):
+    """Remove benchmark memories"""
+    result = memory.get_all(user_id=BENCH_USER)
+    memories = result.get('results', []) if isinstance(result, dict) else result
+    for mem in memories or []:
+        memory.delete(mem['id'])
+    get_keyword_index(memory).drop(BENCH_USER)
+
+
+def run_mode(memory, mode: str, limit: int, repeats: int):
+    """Return (hit rate @limit, mean reciprocal rank, latencies in ms)"""
+    hits = 0
+    reciprocal_ranks = []
+    latencies = []
+    for query, expected in QUERIES:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = search_memories(memory, query, user_id=BENCH_USER, limit=limit, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+        rank = next((i for i, mem in enumerate(results, 1) if expected.lower() in mem['memory'].lower()), None)
+        if rank:
+            hits += 1
+            reciprocal_ranks.append(1 / rank)
+        else:
+            reciprocal_ranks.append(0.0)
+    return hits / len(QUERIES), statistics.mean(reciprocal_ranks), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory search modes")
+    parser.add_argument("--limit", type=int, default=3, help="Results per query")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query")
+    parser.add_argument("--keep", action="store_true", help="Keep seeded memories afterwards")
+    args = parser.parse_args()
+
+    memory = get_memory()
+    cleanup(memory)
+    print(f"Seeding {len(FACTS)} memories for {BENCH_USER}...")
+    seed(memory)
+
+    try:
+        print(f"\n{'mode':<8} {'hit@' + str(args.limit):>7} {'MRR':>6} {'p50 ms':>9} {'p95 ms':>9}")
+        print("-" * 43)
+        for mode in SEARCH_MODES:
+            hit_rate, mrr, latencies = run_mode(memory, mode, args.limit, args.repeats)
+            latencies.sort()
+            p50 = statistics.median(latencies)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{mode:<8} {hit_rate:>7.2f} {mrr:>6.2f} {p50:>9.2f} {p95:>9.2f}")
+    finally:
+        if not args.keep:
+            cleanup(memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark Memory Pre-Retrieval
+Compares LLM calls, tokens and latency per turn with and without
+injecting prefetched memories into the turn
+"""
+
+import argparse
+import statistics
+import time
+import api
+from memory_agent import create_memory_agent, run_agent_turn
+
+BENCH_USER = "benchmark_prefetch"
+
+SETUP_MESSAGES = [
+    "Hi, my name is Alice and I love machine learning and AWS",
+    "I'm planning to build a chatbot using Python",
+]
+
+QUESTIONS = [
+    "What's my name?",
+    "What do I like?",
+    "What projects am I working on?",
+    "Which language am I using for my chatbot?",
+]
+
+
+def run(prefetch: bool):
+    """Run every question on a fresh agent; return per-turn usage and latencies"""
+    api.MEMORY_PREFETCH = prefetch
+    agent = create_memory_agent(BENCH_USER)
+    usages, latencies = [], []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        context = api.build_turn_context(question, BENCH_USER)
+        query = f"{question}\n\n{context}" if context else question
+        _, usage = run_agent_turn(agent, query, question)
+        latencies.append(time.perf_counter() - start)
+        usages.append(usage)
+    return usages, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory pre-retrieval")
+    parser.add_argument("--skip-setup", action="store_true", help="Reuse memories from a previous run")
+    args = parser.parse_args()
+
+    if not args.skip_setup:
+        setup_agent = create_memory_agent(BENCH_USER)
+        for message in SETUP_MESSAGES:
+            run_agent_turn(setup_agent, message)
+
+    print(f"\n{'prefetch':<9} {'LLM calls/turn':>15} {'input tok/turn':>15} {'mean s':>8}")
+    print("-" * 50)
+    for prefetch in (False, True):
+        usages, latencies = run(prefetch)
+        calls = statistics.mean(u["llm_calls"] for u in usages)
+        tokens = statistics.mean(u["input_tokens"] for u in usages)
+        print(f"{str(prefetch):<9} {calls:>15.2f} {tokens:>15.0f} {statistics.mean(latencies):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Token-Budgeted Conversation Manager
+Keeps recent turns verbatim and folds older turns into a rolling summary
+"""
+
+import copy
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from strands.agent.conversation_manager import ConversationManager
+from strands.types.exceptions import ContextWindowOverflowException
+from custom_nova_llm import NovaMem0LLM
+from memory_index import get_keyword_index
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "12000"))
+RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "4"))
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "2000"))
+SUMMARIZER = os.getenv("CONVERSATION_SUMMARIZER", "model")  # model | mem0 | none
+SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL", "amazon.nova-micro-v1:0")
+
+SUMMARY_PREFIX = "[Summary of earlier conversation]"
+CHARS_PER_TOKEN = 4
+
+SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a conversation between a user and an AI assistant.
+Merge the existing summary with the new conversation excerpt into one concise summary.
+Keep names, preferences, decisions, AWS resource names and diagram filenames.
+Drop pleasantries and raw tool output. Reply with the summary only.
+"""
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Rough token estimate for a list of Bedrock messages"""
+    chars = 0
+    for message in messages:
+        for block in message.get("content", []):
+            if "text" in block:
+                chars += len(block["text"])
+            elif "toolUse" in block:
+                chars += len(json.dumps(block["toolUse"].get("input", {}), default=str)) + 32
+            elif "toolResult" in block:
+                chars += sum(len(c.get("text", "")) or len(json.dumps(c, default=str))
+                             for c in block["toolResult"].get("content", []))
+            else:
+                chars += 256
+    return chars // CHARS_PER_TOKEN
+
+
+def _is_turn_start(message: Dict[str, Any]) -> bool:
+    """A turn starts with a user message that is not a tool result"""
+    return message.get("role") == "user" and not any("toolResult" in block for block in message.get("content", []))
+
+
+def _render_transcript(messages: List[Dict[str, Any]], max_chars: int = 400) -> str:
+    """Flatten messages into a compact transcript for summarization"""
+    lines = []
+    for message in messages:
+        for block in message.get("content", []):
+            if "text" in block and not block["text"].startswith(SUMMARY_PREFIX):
+                lines.append(f"{message['role']}: {block['text'][:max_chars]}")
+            elif "toolUse" in block:
+                lines.append(f"assistant called {block['toolUse'].get('name')}")
+    return "\n".join(lines)
+
+
+class TokenBudgetConversationManager(ConversationManager):
+    """
+    Bound conversation history to a token budget.
+
+    Long tool results are elided, the most recent turns are kept verbatim and
+    everything older is folded into a rolling summary produced by a cheap
+    model (or pushed into Mem0) and carried on the first kept user message.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = TOKEN_BUDGET,
+        preserve_recent_turns: int = RECENT_TURNS,
+        max_tool_result_chars: int = TOOL_RESULT_MAX_CHARS,
+        summarizer: str = SUMMARIZER,
+        memory=None,
+        user_id: str = "default"
+    ):
+        super().__init__()
+        self.token_budget = token_budget
+        self.preserve_recent_turns = max(1, preserve_recent_turns)
+        self.max_tool_result_chars = max_tool_result_chars
+        self.summarizer = summarizer
+        self.memory = memory
+        self.user_id = user_id
+        self.summary = ""
+        self.last_context_tokens = 0
+        self._summary_llm = None
+
+    def apply_management(self, agent, **kwargs) -> None:
+        """Elide long tool results and fold old turns once over budget"""
+        self._truncate_tool_results(agent.messages)
+        if estimate_tokens(agent.messages) > self.token_budget:
+            self._fold(agent, self.preserve_recent_turns)
+        self.last_context_tokens = estimate_tokens(agent.messages)
+
+    def reduce_context(self, agent, e: Optional[Exception] = None, **kwargs) -> None:
+        """Shrink history after a context window overflow"""
+        if not self._fold(agent, max(1, self.preserve_recent_turns // 2)):
+            if not self._truncate_tool_results(agent.messages, max_chars=self.max_tool_result_chars // 4):
+                raise ContextWindowOverflowException("Unable to reduce conversation context") from e
+
+    def get_state(self) -> Dict[str, Any]:
+        state = super().get_state()
+        state["summary"] = self.summary
+        return state
+
+    def restore_from_session(self, state: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        result = super().restore_from_session(state)
+        self.summary = state.get("summary", "")
+        return result
+
+    def _truncate_tool_results(self, messages: List[Dict[str, Any]], max_chars: Optional[int] = None) -> bool:
+        """Elide oversized tool result text in place; return True if anything changed"""
+        max_chars = max_chars or self.max_tool_result_chars
+        changed = False
+        for message in messages:
+            for block in message.get("content", []):
+                result = block.get("toolResult")
+                if not result:
+                    continue
+                for item in result.get("content", []):
+                    text = item.get("text")
+                    if text and len(text) > max_chars:
+                        item["text"] = f"{text[:max_chars]}... [{len(text) - max_chars} chars elided]"
+                        changed = True
+        return changed
+
+    def _fold(self, agent, keep_turns: int) -> bool:
+        """Fold all but the last keep_turns turns into the summary"""
+        messages = agent.messages
+        turn_starts = [i for i, message in enumerate(messages) if _is_turn_start(message)]
+        if len(turn_starts) <= keep_turns:
+            return False
+
+        split = turn_starts[-keep_turns]
+        folded, kept = messages[:split], messages[split:]
+        self.summary = self._summarize(folded)
+
+        # Carry the summary on the first kept user message so roles still alternate
+        first = copy.deepcopy(kept[0])
+        first["content"] = [block for block in first["content"]
+                            if not block.get("text", "").startswith(SUMMARY_PREFIX)]
+        if self.summary:
+            first["content"].insert(0, {"text": f"{SUMMARY_PREFIX}\n{self.summary}"})
+        kept[0] = first
+
+        agent.messages[:] = kept
+        self.removed_message_count += len(folded)
+        logger.info(f"Folded {len(folded)} messages for {self.user_id}; "
+                    f"context now ~{estimate_tokens(agent.messages)} tokens")
+        return True
+
+    def _summarize(self, folded: List[Dict[str, Any]]) -> str:
+        """Produce the new rolling summary from the previous one plus folded messages"""
+        transcript = _render_transcript(folded)
+        if self.summarizer == "mem0" and self.memory is not None:
+            try:
+                result = self.memory.add(transcript, user_id=self.user_id)
+                # Keep keyword and hybrid search in step with Mem0
+                get_keyword_index(self.memory).apply_add_result(self.user_id, result)
+                return "Earlier turns were saved to long-term memory; use search_memory to recall details."
+            except Exception as e:
+                logger.warning(f"Could not push folded turns to memory: {e}")
+        elif self.summarizer == "model":
+            try:
+                if self._summary_llm is None:
+                    self._summary_llm = NovaMem0LLM({"model": SUMMARY_MODEL, "temperature": 0.0, "max_tokens": 400})
+                return self._summary_llm.generate_response([
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Existing summary:\n{self.summary or '(none)'}\n\nNew excerpt:\n{transcript}"}
+                ]).strip()
+            except Exception as e:
+                logger.warning(f"Summarization failed, keeping a plain digest: {e}")
+
+        # Fallback: bounded plain-text digest
+        digest = f"{self.summary}\n{transcript}".strip()
+        return digest[-self.max_tool_result_chars:]
+
+
+def create_conversation_manager(user_id: str = "default", memory=None) -> TokenBudgetConversationManager:
+    """Create a conversation manager configured from the environment"""
+    return TokenBudgetConversationManager(memory=memory, user_id=user_id)
@@ -4,6 +4,7 @@
 import json
 import boto3
 from typing import List, Dict, Any, Optional, Union
+from tracing import span
 
 class NovaMem0LLM:
     """Custom LLM wrapper for Amazon Nova models compatible with Mem0"""
@@ -70,7 +71,12 @@ class NovaMem0LLM:
             converse_params["system"] = system_prompts
         
         # Call Nova using Converse API
-        response = self.client.converse(**converse_params)
+        with span("nova.converse", model_id=self.model, max_tokens=self.max_tokens) as current:
+            response = self.client.converse(**converse_params)
+            usage = response.get("usage", {})
+            if current is not None:
+                current.set_attribute("input_tokens", usage.get("inputTokens", 0))
+                current.set_attribute("output_tokens", usage.get("outputTokens", 0))
         
         # Extract text from response
         return response["output"]["message"]["content"][0]["text"]
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Diagram Render Cache
+Content-addressed store of rendered diagrams keyed on normalized source
+and output options, with least-recently-used eviction under a size cap
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+from metrics import DIAGRAM_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_CACHE_ENABLED = os.getenv("DIAGRAM_CACHE_ENABLED", "true").lower() == "true"
+DIAGRAM_CACHE_DIR = os.getenv("DIAGRAM_CACHE_DIR", os.path.join("diagrams", "cache"))
+DIAGRAM_CACHE_MAX_MB = float(os.getenv("DIAGRAM_CACHE_MAX_MB", "200"))
+
+
+def normalize_source(code: str) -> str:
+    """Drop comments-only lines, blank lines and trailing whitespace so cosmetic edits share a key"""
+    lines = []
+    for line in code.replace("\r\n", "\n").split("\n"):
+        line = line.rstrip()
+        if line and not line.lstrip().startswith("#"):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def cache_key(code: str, **options) -> str:
+    """SHA-256 of the normalized source plus the output options"""
+    payload = json.dumps({"source": normalize_source(code), "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(source: Path, target: Path):
+    """Hard-link source to target (copy across filesystems), replacing target atomically"""
+    if target.exists() and os.path.samefile(source, target):
+        return
+    tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+class RenderCache:
+    """Rendered artifacts stored as <dir>/<key[:2]>/<key>.<ext>"""
+
+    def __init__(self, directory: str = DIAGRAM_CACHE_DIR, max_bytes: int = int(DIAGRAM_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = sum(path.stat().st_size for path in self._artifacts())
+        # Last hit per entry; kept here rather than as mtime because user artifacts are
+        # hard links to the same inodes (entries not hit since startup fall back to mtime)
+        self._last_access: Dict[Path, float] = {}
+
+    def _artifacts(self):
+        return (path for path in self.directory.glob("??/*") if path.is_file() and not path.name.startswith("."))
+
+    def path_for(self, key: str, extension: str) -> Path:
+        return self.directory / key[:2] / f"{key}.{extension}"
+
+    def get(self, key: str, extension: str) -> Optional[Path]:
+        """Return the cached artifact and mark it recently used, or None"""
+        path = self.path_for(key, extension)
+        if not path.exists():
+            path = None
+        with self._lock:
+            if path is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._last_access[path] = time.time()
+        DIAGRAM_CACHE_REQUESTS.labels(result="miss" if path is None else "hit").inc()
+        return path
+
+    def put(self, key: str, extension: str, source: Path) -> Path:
+        """Store a rendered file under its key and evict old entries past the size cap"""
+        path = self.path_for(key, extension)
+        path.parent.mkdir(exist_ok=True)
+        existed = path.exists()
+        link_or_copy(source, path)
+        if not existed:
+            with self._lock:
+                self._total_bytes += path.stat().st_size
+            self._evict()
+        return path
+
+    def _evict(self):
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = []
+            for path in self._artifacts():
+                stat = path.stat()
+                entries.append((self._last_access.get(path, stat.st_mtime), stat.st_size, path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            # Evict down to 90% of the cap so we don't scan on every put
+            while entries and total > self.max_bytes * 0.9:
+                _, size, path = entries.pop(0)
+                path.unlink(missing_ok=True)
+                self._last_access.pop(path, None)
+                total -= size
+            self._total_bytes = total
+        logger.info(f"Diagram cache evicted to {total / 1024 / 1024:.1f} MB")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / requests if requests else 0.0,
+                    "size_mb": round(self._total_bytes / 1024 / 1024, 2)}
+
+
+# Singleton cache instance
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+def get_render_cache() -> Optional[RenderCache]:
+    """Get or create the shared render cache (None when disabled)"""
+    global _cache_instance
+    if not DIAGRAM_CACHE_ENABLED:
+        return None
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = RenderCache()
+    return _cache_instance
@@ -5,64 +5,292 @@ Bypasses MCP server's SIGALRM timeout mechanism
 """
 
 import os
+import time
+import queue
+import shutil
 import logging
 import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import FrozenSet, List, Optional
+from metrics import DIAGRAM_RENDER_SECONDS, DIAGRAM_WORKER_SECONDS
+from tracing import traced
+from diagram_worker import (AWS_MODULES, DIAGRAM_TIMEOUT, RenderLimitError, layout_options, node_types,
+                            render_job, serve, warm_up)
+from diagram_cache import cache_key, get_render_cache, link_or_copy
+from diagram_store import DiagramStore, new_diagram_id
 
 logger = logging.getLogger(__name__)
 
+# Render processes; each handles one job at a time
+DIAGRAM_WORKERS = int(os.getenv("DIAGRAM_WORKERS", str(os.cpu_count() or 2)))
+# "spawn" is safe from the threaded API process and is the only option on Windows;
+# "forkserver" imports diagrams once in the server so new workers start warm
+DIAGRAM_START_METHOD = os.getenv("DIAGRAM_START_METHOD", "spawn")
+# Extra outputs written next to each PNG
+DIAGRAM_FORMATS = [f.strip() for f in os.getenv("DIAGRAM_FORMATS", "png,svg").split(",") if f.strip()]
+DIAGRAM_THUMBNAIL_WIDTH = int(os.getenv("DIAGRAM_THUMBNAIL_WIDTH", "320"))  # 0 disables thumbnails
+
+# Extra wait past DIAGRAM_TIMEOUT before the worker is killed from outside
+KILL_GRACE_SECONDS = 10
+# Workers tried for one job before giving up (e.g. when every new worker fails to preload)
+WORKER_START_ATTEMPTS = 3
+
+class _Worker:
+    """One render process and the parent's end of its job pipe"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=serve, args=(child_conn,), name="diagram-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+class RenderPool:
+    """
+    Long-lived render processes that import diagrams once and run one job
+    at a time each. A job that outlives its deadline gets its own worker
+    killed and replaced; jobs in the other workers are unaffected.
+    """
+
+    def __init__(self, workers: int, context):
+        self.context = context
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.context)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            if self._closed:
+                return
+        self._idle.put(self._spawn())
+
+    def _start(self, func, args) -> _Worker:
+        """Hand the job to an idle worker and wait until it starts running it"""
+        for _ in range(WORKER_START_ATTEMPTS):
+            worker = self._idle.get()
+            if worker is None:
+                self._idle.put(None)
+                raise RuntimeError("Diagram render pool is shut down")
+            try:
+                worker.conn.send((func, args))
+                # Waits out queueing and worker start-up, neither of which counts against the deadline
+                worker.conn.recv()
+                return worker
+            except (EOFError, OSError):
+                logger.warning(f"Diagram worker exited before starting a job (exit code {worker.process.exitcode})")
+                self._replace(worker)
+        raise RuntimeError("Diagram workers keep exiting before they start a job; check the worker logs")
+
+    def run(self, func, *args, deadline: Optional[float] = None):
+        """Run func(*args) in a worker; deadline is in seconds from when the worker starts the job"""
+        worker = self._start(func, args)
+        try:
+            if deadline is not None and not worker.conn.poll(deadline):
+                self._replace(worker)
+                logger.warning(f"Killed unresponsive diagram worker {worker.process.pid}")
+                raise RenderLimitError(f"Diagram render timed out after {deadline:.0f}s")
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._replace(worker)
+            raise RenderLimitError(f"Diagram worker died during the render "
+                                   f"(exit code {worker.process.exitcode})") from None
+        self._idle.put(worker)
+        if status == "error":
+            raise value
+        return value
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        self._idle.put(None)
+        for worker in workers:
+            worker.kill()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_render_pool() -> RenderPool:
+    """Get or create the shared diagram render pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                context = multiprocessing.get_context(DIAGRAM_START_METHOD)
+                if DIAGRAM_START_METHOD == "forkserver":
+                    context.set_forkserver_preload(["diagram_worker", *AWS_MODULES])
+                # Workers are long-lived and import the node modules once, at startup
+                _pool = RenderPool(DIAGRAM_WORKERS, context)
+                logger.info(f"Started diagram render pool with {DIAGRAM_WORKERS} workers ({DIAGRAM_START_METHOD})")
+    return _pool
+
+def warm_render_pool():
+    """Wait until every render worker has started and preloaded, rather than on the first diagram requests"""
+    pool = get_render_pool()
+    with ThreadPoolExecutor(max_workers=DIAGRAM_WORKERS) as executor:
+        preload_times = list(executor.map(lambda _: pool.run(warm_up), range(DIAGRAM_WORKERS)))
+    logger.info(f"Diagram workers ready; preload took {max(preload_times):.2f}s")
+
+_node_types = None
+
+def get_node_types() -> FrozenSet[str]:
+    """Node class names the render workers predefine, fetched from a worker once"""
+    global _node_types
+    if _node_types is None:
+        _node_types = frozenset(get_render_pool().run(node_types))
+    return _node_types
+
+def shutdown_render_pool():
+    """Stop the render workers (call on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
 class DiagramGenerator:
     """Direct diagram generation without MCP server timeout issues"""
     
-    def __init__(self, output_dir: str = "diagrams"):
+    def __init__(self, output_dir: str = "diagrams", formats: Optional[List[str]] = None,
+                 thumbnail_width: int = DIAGRAM_THUMBNAIL_WIDTH):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.formats = ["png"] + [f for f in (formats or DIAGRAM_FORMATS) if f != "png"]
+        self.thumbnail_width = thumbnail_width
+        # Artifact extensions per render: png, any extra formats, then the thumbnail
+        self.variants = self.formats + (["thumb.png"] if thumbnail_width else [])
     
-    def generate_diagram(self, code: str, workspace_dir: Optional[str] = None) -> str:
+    @traced("diagram.render")
+    def generate_diagram(self, code: str, workspace_dir: Optional[str] = None,
+                         filename: Optional[str] = None, aws_namespace: bool = False,
+                         user_id: str = "default", engine: str = "auto", dpi: Optional[int] = None,
+                         size: Optional[str] = None) -> str:
         """
         Generate diagram from Python code
         
+        Repeat renders of the same (normalized) code are served from the
+        render cache. Otherwise the code runs in a render worker process
+        inside its own scratch directory, so concurrent renders never share
+        a working directory. Each job writes to its own pre-assigned path,
+        <output>/generated-diagrams/<user>/<date>/<diagram id>.png, with
+        the SVG (<id>.svg) and thumbnail (<id>.thumb.png) variants beside it.
+        
         Args:
             code: Python code using diagrams package
-            workspace_dir: Optional directory for output
+            workspace_dir: Optional directory for output (default: the generator's output_dir)
+            filename: Optional output path name without extension, written to workspace_dir
+                as-is instead of the sharded store
+            aws_namespace: Run the code with Diagram/Cluster/Edge and all AWS nodes predefined
+            user_id: Owner of the diagram, used to shard the store
+            engine: Graphviz layout engine, or "auto" to pick one from the graph size
+            dpi: Output resolution (default: Graphviz's, or DIAGRAM_LARGE_DPI for auto-switched graphs)
+            size: Maximum "width,height" in inches; append "!" to scale small diagrams up
             
         Returns:
-            Path to generated diagram file
+            Path to generated diagram PNG
         """
-        try:
-            # Set output directory
-            if workspace_dir:
-                output_path = Path(workspace_dir)
-            else:
-                output_path = self.output_dir
-            
+        start = time.perf_counter()
+        output_path = Path(workspace_dir) if workspace_dir else self.output_dir
+        layout = layout_options(engine, dpi, size)
+        key = cache_key(code, outformat=self.formats, thumbnail_width=self.thumbnail_width,
+                        aws_namespace=aws_namespace, layout=layout)
+        if filename:
             output_path.mkdir(parents=True, exist_ok=True)
-            
-            # Change to output directory
-            original_dir = os.getcwd()
-            os.chdir(output_path)
-            
+            target = output_path / f"{filename}.png"
+        else:
+            store = DiagramStore(output_path / "generated-diagrams")
+            target = store.path_for(user_id, new_diagram_id())
+        
+        cache = get_render_cache()
+        cached = cache.get(key, "png") if cache else None
+        if cached is not None:
             try:
-                # Execute the diagram code
-                exec_globals = {}
-                exec(code, exec_globals)
-                
-                # Find generated PNG files
-                png_files = list(output_path.glob("*.png"))
-                if png_files:
-                    latest_file = max(png_files, key=lambda p: p.stat().st_mtime)
-                    logger.info(f"Diagram generated: {latest_file}")
-                    return str(latest_file)
-                else:
-                    raise FileNotFoundError("No diagram file was generated")
-                    
-            finally:
-                os.chdir(original_dir)
+                for extension in self.variants:
+                    cached_variant = cache.path_for(key, extension)
+                    if extension == "png" or cached_variant.exists():
+                        link_or_copy(cached_variant, self._variant_path(target, extension))
+                DIAGRAM_RENDER_SECONDS.labels(status="cached").observe(time.perf_counter() - start)
+                logger.info(f"Diagram served from cache: {target}")
+                return str(target)
+            except FileNotFoundError:
+                logger.info("Cached diagram was evicted during lookup; rendering again")
+        
+        status = "error"
+        job_dir = tempfile.mkdtemp(prefix=f"render-{key[:8]}-")
+        try:
+            job = self._run_job(code, job_dir, aws_namespace, layout)
+            for phase in ("preload", "setup", "exec"):
+                if job[f"{phase}_s"]:
+                    DIAGRAM_WORKER_SECONDS.labels(phase=phase).observe(job[f"{phase}_s"])
+            logger.info(f"Render job: setup {job['setup_s'] * 1000:.1f} ms, exec {job['exec_s'] * 1000:.1f} ms, "
+                        f"layout {job['layout']}")
+            png_files = [name for name in job["files"] if name.endswith(".png") and not name.endswith(".thumb.png")]
+            if not png_files:
+                raise FileNotFoundError("No diagram file was generated")
+            
+            # Publish variants PNG last so anything that sees the PNG sees the rest too
+            rendered = Path(job_dir) / png_files[0]
+            for extension in reversed(self.variants):
+                variant = self._variant_path(rendered, extension)
+                if not variant.exists():
+                    continue
+                if cache:
+                    variant = cache.put(key, extension, variant)
+                link_or_copy(variant, self._variant_path(target, extension))
+            logger.info(f"Diagram generated: {target}")
+            status = "success"
+            return str(target)
                 
+        except RenderLimitError as e:
+            status = "limit"
+            logger.error(f"Failed to generate diagram: {e}")
+            raise
         except Exception as e:
             logger.error(f"Failed to generate diagram: {e}", exc_info=True)
             raise
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            DIAGRAM_RENDER_SECONDS.labels(status=status).observe(time.perf_counter() - start)
+    
+    def _run_job(self, code: str, job_dir: str, aws_namespace: bool, layout: dict):
+        """Run a render job, killing its worker if it outlives the in-worker limits"""
+        return get_render_pool().run(render_job, code, job_dir, aws_namespace, self.formats,
+                                     self.thumbnail_width, layout, DIAGRAM_TIMEOUT,
+                                     deadline=DIAGRAM_TIMEOUT + KILL_GRACE_SECONDS if DIAGRAM_TIMEOUT > 0 else None)
+    
+    @staticmethod
+    def _variant_path(png_path: Path, extension: str) -> Path:
+        """<stem>.png -> <stem>.<extension>"""
+        return png_path.with_name(f"{png_path.name[:-len('.png')]}.{extension}")
+
+_generator_instance = None
+
+def get_diagram_generator() -> DiagramGenerator:
+    """Get or create the shared generator writing under ./diagrams"""
+    global _generator_instance
+    if _generator_instance is None:
+        _generator_instance = DiagramGenerator(os.path.abspath("diagrams"))
+    return _generator_instance
 
 def create_diagram_tool():
     """Create a Strands-compatible tool for diagram generation"""
@@ -71,33 +299,25 @@ def create_diagram_tool():
     generator = DiagramGenerator()
     
     @tool
-    def generate_aws_diagram(code: str, workspace_dir: Optional[str] = None) -> str:
+    def generate_aws_diagram(code: str, workspace_dir: Optional[str] = None, user_id: str = "default",
+                             engine: str = "auto", dpi: Optional[int] = None, size: Optional[str] = None) -> str:
         """
         Generate AWS architecture diagram from Python code.
         
         Args:
             code: Python code using diagrams package (no imports needed)
             workspace_dir: Optional output directory
+            user_id: User the diagram belongs to
+            engine: Layout engine: auto (default), dot, neato, fdp, sfdp, twopi or circo
+            dpi: Output resolution, e.g. 72 for large diagrams or 150 for print
+            size: Maximum "width,height" in inches, e.g. "20,12"
             
         Returns:
             Path to generated diagram PNG file
         """
-        # Add necessary imports to the code
-        full_code = """
-from diagrams import Diagram, Cluster, Edge
-from diagrams.aws.compute import *
-from diagrams.aws.database import *
-from diagrams.aws.network import *
-from diagrams.aws.storage import *
-from diagrams.aws.analytics import *
-from diagrams.aws.integration import *
-from diagrams.aws.ml import *
-from diagrams.aws.security import *
-from diagrams.aws.management import *
-
-""" + code
-        
-        return generator.generate_diagram(full_code, workspace_dir)
+        # Workers predefine the diagrams and AWS node names, so no imports are prepended
+        return generator.generate_diagram(code, workspace_dir, aws_namespace=True, user_id=user_id,
+                                          engine=engine, dpi=dpi, size=size)
     
     return generate_aws_diagram
 
@@ -120,3 +340,4 @@ with Diagram("Test Serverless", show=False, filename="test_diagram"):
     generator = DiagramGenerator()
     result = generator.generate_diagram(test_code)
     print(f"Generated: {result}")
+    shutdown_render_pool()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Diagram Model
+Per-user graph of the current diagram (nodes, clusters, edges), edited
+with small patch operations and rendered to diagrams code on demand
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Collection, Dict, List, Optional, Tuple
+from diagram_store import safe_user_dir
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_MODEL_DIR = os.getenv("DIAGRAM_MODEL_DIR", "diagram_models")
+
+DIRECTIONS = ("LR", "RL", "TB", "BT")
+# Node types are diagrams.aws class names, e.g. Lambda, APIGateway, Dynamodb
+_NODE_TYPE_RE = re.compile(r"^[A-Z][A-Za-z0-9]*$")
+REQUIRED_FIELDS = {
+    "add_node": ("id",),
+    "remove_node": ("id",),
+    "connect": ("source", "target"),
+    "disconnect": ("source", "target"),
+    "add_cluster": ("id",),
+    "remove_cluster": ("id",),
+    "set_title": ("title",),
+    "set_direction": ("direction",),
+}
+
+
+class DiagramModel:
+    """Nodes, clusters and edges of one diagram"""
+
+    def __init__(self, title: str = "Architecture", direction: str = "LR",
+                 nodes: Optional[Dict[str, Dict[str, Any]]] = None,
+                 clusters: Optional[Dict[str, Dict[str, Any]]] = None,
+                 edges: Optional[List[Dict[str, Any]]] = None):
+        self.title = title
+        self.direction = direction
+        self.nodes = nodes or {}
+        self.clusters = clusters or {}
+        self.edges = edges or []
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DiagramModel":
+        return cls(data.get("title", "Architecture"), data.get("direction", "LR"),
+                   data.get("nodes"), data.get("clusters"), data.get("edges"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"title": self.title, "direction": self.direction, "nodes": self.nodes,
+                "clusters": self.clusters, "edges": self.edges}
+
+    def _require(self, collection: Dict, key: Optional[str], kind: str):
+        if key is not None and key not in collection:
+            raise ValueError(f"Unknown {kind}: {key}")
+
+    def apply(self, operation: Dict[str, Any], node_types: Optional[Collection[str]] = None):
+        """
+        Apply one patch operation; raises ValueError if it is invalid.
+        node_types, when given, is the set of node classes the renderer knows.
+        """
+        op = operation.get("op")
+        missing = [name for name in REQUIRED_FIELDS.get(op, ()) if operation.get(name) in (None, "")]
+        if missing:
+            raise ValueError(f"{op} needs {' and '.join(missing)}: {operation}")
+        if op == "add_node":
+            node_type = operation.get("type", "")
+            if not _NODE_TYPE_RE.match(node_type):
+                raise ValueError(f"Invalid node type: {node_type!r}")
+            if node_types is not None and node_type not in node_types:
+                raise ValueError(f"Unknown node type: {node_type!r} "
+                                 "(use a diagrams.aws class name, e.g. Lambda, S3, Users)")
+            self._require(self.clusters, operation.get("cluster"), "cluster")
+            self.nodes[operation["id"]] = {"type": node_type, "label": operation.get("label", operation["id"]),
+                                           "cluster": operation.get("cluster")}
+        elif op == "remove_node":
+            self._require(self.nodes, operation["id"], "node")
+            del self.nodes[operation["id"]]
+            self.edges = [e for e in self.edges if operation["id"] not in (e["source"], e["target"])]
+        elif op == "connect":
+            self._require(self.nodes, operation["source"], "node")
+            self._require(self.nodes, operation["target"], "node")
+            self.edges = [e for e in self.edges if (e["source"], e["target"]) != (operation["source"], operation["target"])]
+            self.edges.append({"source": operation["source"], "target": operation["target"],
+                               "label": operation.get("label")})
+        elif op == "disconnect":
+            self.edges = [e for e in self.edges if (e["source"], e["target"]) != (operation["source"], operation["target"])]
+        elif op == "add_cluster":
+            self._require(self.clusters, operation.get("parent"), "cluster")
+            ancestor = operation.get("parent")
+            while ancestor is not None:
+                if ancestor == operation["id"]:
+                    raise ValueError(f"Cluster {operation['id']} cannot be nested in itself")
+                ancestor = self.clusters[ancestor].get("parent")
+            self.clusters[operation["id"]] = {"label": operation.get("label", operation["id"]),
+                                              "parent": operation.get("parent")}
+        elif op == "remove_cluster":
+            self._require(self.clusters, operation["id"], "cluster")
+            parent = self.clusters.pop(operation["id"])["parent"]
+            for item in list(self.nodes.values()) + list(self.clusters.values()):
+                for key in ("cluster", "parent"):
+                    if item.get(key) == operation["id"]:
+                        item[key] = parent
+        elif op == "set_title":
+            self.title = operation["title"]
+        elif op == "set_direction":
+            if operation["direction"] not in DIRECTIONS:
+                raise ValueError(f"Invalid direction: {operation['direction']}")
+            self.direction = operation["direction"]
+        elif op == "reset":
+            self.__init__()
+        else:
+            raise ValueError(f"Unknown operation: {op}")
+
+    def to_code(self) -> str:
+        """diagrams code for the model (run with the render workers' AWS namespace)"""
+        names = {node_id: f"n{i}" for i, node_id in enumerate(self.nodes)}
+        lines = [f"with Diagram({self.title!r}, show=False, direction={self.direction!r}):"]
+
+        def emit(cluster: Optional[str], indent: int):
+            pad = "    " * indent
+            for node_id, node in self.nodes.items():
+                if node.get("cluster") == cluster:
+                    lines.append(f"{pad}{names[node_id]} = {node['type']}({node['label']!r})")
+            for cluster_id, item in self.clusters.items():
+                if item.get("parent") == cluster:
+                    lines.append(f"{pad}with Cluster({item['label']!r}):")
+                    before = len(lines)
+                    emit(cluster_id, indent + 1)
+                    if len(lines) == before:
+                        lines.append(f"{pad}    pass")
+
+        emit(None, 1)
+        for edge in self.edges:
+            link = f"Edge(label={edge['label']!r})" if edge.get("label") else "Edge()"
+            lines.append(f"    {names[edge['source']]} >> {link} >> {names[edge['target']]}")
+        if len(lines) == 1:
+            lines.append("    pass")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Compact description for the agent"""
+        nodes = ", ".join(f"{node_id}:{node['type']}" + (f"@{node['cluster']}" if node.get("cluster") else "")
+                          for node_id, node in self.nodes.items())
+        edges = ", ".join(f"{e['source']}->{e['target']}" for e in self.edges)
+        clusters = ", ".join(self.clusters)
+        return f"'{self.title}' nodes [{nodes}] clusters [{clusters}] edges [{edges}]"
+
+
+class DiagramModelStore:
+    """One JSON model per user under DIAGRAM_MODEL_DIR"""
+
+    def __init__(self, directory: str = DIAGRAM_MODEL_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, user_id: str) -> Path:
+        return self.directory / f"{safe_user_dir(user_id)}.json"
+
+    def lock(self, user_id: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def load(self, user_id: str) -> DiagramModel:
+        path = self._path(user_id)
+        if not path.exists():
+            return DiagramModel()
+        with open(path, "r", encoding="utf-8") as f:
+            return DiagramModel.from_dict(json.load(f))
+
+    def save(self, user_id: str, model: DiagramModel):
+        path = self._path(user_id)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f)
+        os.replace(tmp, path)
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+def get_diagram_model_store() -> DiagramModelStore:
+    """Get or create the shared diagram model store"""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = DiagramModelStore()
+    return _store_instance
+
+
+def edit_diagram(user_id: str, operations: List[Dict[str, Any]], render,
+                 node_types: Optional[Collection[str]] = None) -> Tuple[str, DiagramModel]:
+    """
+    Apply operations to the user's model, render it and persist it.
+
+    render(code) must return the rendered path. The stored model only
+    changes when every operation is valid and the render succeeds.
+    node_types restricts add_node to node classes the renderer knows.
+
+    Returns:
+        tuple: (rendered path, updated model)
+    """
+    store = get_diagram_model_store()
+    with store.lock(user_id):
+        model = store.load(user_id)
+        for operation in operations:
+            model.apply(operation, node_types)
+        path = render(model.to_code())
+        store.save(user_id, model)
+    return path, model
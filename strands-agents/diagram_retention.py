@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Diagram Retention
+Age-based TTL plus per-user and global size quotas for rendered diagrams.
+Diagrams named in a user's memories are never removed. Runs as a
+background sweeper in the API or from the command line.
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from metrics import DIAGRAM_RECLAIMED_BYTES
+from diagram_store import OWNER_FILE, shard_owner
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_RETENTION_DAYS = float(os.getenv("DIAGRAM_RETENTION_DAYS", "30"))
+DIAGRAM_USER_QUOTA_MB = float(os.getenv("DIAGRAM_USER_QUOTA_MB", "100"))
+DIAGRAM_TOTAL_QUOTA_MB = float(os.getenv("DIAGRAM_TOTAL_QUOTA_MB", "2000"))
+DIAGRAM_SWEEP_INTERVAL = float(os.getenv("DIAGRAM_SWEEP_INTERVAL", "3600"))
+DIAGRAM_SWEEP_ENABLED = os.getenv("DIAGRAM_SWEEP_ENABLED", "true").lower() == "true"
+
+# Memories read per user when collecting references; the limit grows tenfold
+# while a page comes back full, and the sweep fails past the maximum
+MEMORY_PAGE_SIZE = 1000
+MEMORY_SCAN_MAX = 100000
+
+# Any diagram file name mentioned in memory text
+_REFERENCE_RE = re.compile(r"diagram_\w+")
+# Owner recorded for files outside the per-user store
+LEGACY_OWNER = ""
+
+
+class Artifact(NamedTuple):
+    """One diagram: all files sharing a stem (png, svg, thumbnail)"""
+    owner: str
+    name: str
+    files: List[Path]
+    size: int  # this artifact's share of its files' bytes (hard-linked data is split between its links)
+    mtime: float
+
+
+def _shard_day(path: Path) -> float:
+    """Start of the day a store shard directory (YYYY-MM-DD) is named after, or 0"""
+    try:
+        return datetime.strptime(path.parent.name, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _group(paths: Iterable[Path], owner: str) -> List[Artifact]:
+    groups: Dict[str, List[Path]] = {}
+    for path in paths:
+        if path.is_file() and not path.name.startswith("."):
+            groups.setdefault(path.name.split(".", 1)[0], []).append(path)
+    artifacts = []
+    for name, files in groups.items():
+        stats = [path.stat() for path in files]
+        # Cache hits hard-link old inodes into the store, so their mtime can predate the
+        # artifact; the shard's date is per user and bounds the artifact's age
+        mtime = max(max(s.st_mtime for s in stats), _shard_day(files[0]))
+        artifacts.append(Artifact(owner, name, files, sum(s.st_size // max(s.st_nlink, 1) for s in stats), mtime))
+    return artifacts
+
+
+def scan(diagrams_dir: Path) -> List[Artifact]:
+    """
+    Every artifact under diagrams_dir: the per-user store
+    (generated-diagrams/<user>/<date>/) plus flat legacy files in
+    generated-diagrams/ and diagrams/ itself. The render cache is skipped;
+    it has its own size cap.
+    """
+    store = diagrams_dir / "generated-diagrams"
+    artifacts = _group(diagrams_dir.glob("*.*"), LEGACY_OWNER)
+    if store.is_dir():
+        artifacts += _group(store.glob("*.*"), LEGACY_OWNER)
+        for user_dir in (p for p in store.iterdir() if p.is_dir()):
+            artifacts += _group(user_dir.glob("*/*"), shard_owner(user_dir))
+    return artifacts
+
+
+def referenced_diagrams(memory, user_ids: Iterable[str]) -> Set[str]:
+    """Diagram names mentioned in the given users' memories"""
+    names = set()
+    for user_id in user_ids:
+        limit = MEMORY_PAGE_SIZE
+        while True:
+            try:
+                result = memory.get_all(user_id=user_id, limit=limit)
+            except Exception as e:
+                # Without the references we can't tell what is safe to delete
+                raise RuntimeError(f"Could not read memories for {user_id}: {e}") from e
+            memories = (result.get("results", []) if isinstance(result, dict) else result) or []
+            if len(memories) < limit:
+                break
+            if limit >= MEMORY_SCAN_MAX:
+                # A truncated list could leave referenced diagrams unprotected
+                raise RuntimeError(f"{user_id} has more than {MEMORY_SCAN_MAX} memories; not sweeping")
+            limit *= 10
+        for item in memories:
+            names.update(m.split(".", 1)[0] for m in _REFERENCE_RE.findall(item.get("memory", "")))
+    return names
+
+
+class SweepReport(NamedTuple):
+    deleted: Dict[str, int]  # reason -> artifacts
+    reclaimed_bytes: Dict[str, int]  # reason -> bytes
+    protected: int
+    remaining_bytes: int
+
+    @property
+    def total_reclaimed(self) -> int:
+        return sum(self.reclaimed_bytes.values())
+
+
+def sweep(diagrams_dir: Path, protected: Optional[Set[str]] = None,
+          retention_days: float = DIAGRAM_RETENTION_DAYS,
+          user_quota_bytes: int = int(DIAGRAM_USER_QUOTA_MB * 1024 * 1024),
+          total_quota_bytes: int = int(DIAGRAM_TOTAL_QUOTA_MB * 1024 * 1024),
+          dry_run: bool = False) -> SweepReport:
+    """
+    Delete expired diagrams, then the oldest ones over each user's quota,
+    then the oldest ones over the global quota. Protected names are skipped
+    at every step.
+    """
+    protected = protected or set()
+    artifacts = sorted(scan(diagrams_dir), key=lambda a: a.mtime)
+    deleted: Dict[str, int] = {}
+    reclaimed: Dict[str, int] = {}
+    kept: List[Artifact] = []
+
+    def remove(artifact: Artifact, reason: str):
+        freed = artifact.size
+        if not dry_run:
+            freed = 0
+            for path in artifact.files:
+                try:
+                    stat = path.stat()
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                # Data still linked from the cache or another user is not reclaimed
+                if stat.st_nlink == 1:
+                    freed += stat.st_size
+        deleted[reason] = deleted.get(reason, 0) + 1
+        reclaimed[reason] = reclaimed.get(reason, 0) + freed
+        DIAGRAM_RECLAIMED_BYTES.labels(reason=reason).inc(0 if dry_run else freed)
+
+    cutoff = time.time() - retention_days * 86400
+    for artifact in artifacts:
+        if artifact.name not in protected and retention_days > 0 and artifact.mtime < cutoff:
+            remove(artifact, "ttl")
+        else:
+            kept.append(artifact)
+
+    def enforce(candidates: List[Artifact], quota: int, reason: str) -> Set[Tuple[str, str]]:
+        """Remove oldest unprotected candidates until under quota; returns removed (owner, name) pairs"""
+        removed = set()
+        used = sum(a.size for a in candidates)
+        for artifact in candidates:
+            if used <= quota:
+                break
+            if artifact.name in protected:
+                continue
+            remove(artifact, reason)
+            removed.add((artifact.owner, artifact.name))
+            used -= artifact.size
+        return removed
+
+    if user_quota_bytes > 0:
+        removed = set()
+        for owner in {a.owner for a in kept if a.owner != LEGACY_OWNER}:
+            removed |= enforce([a for a in kept if a.owner == owner], user_quota_bytes, "user_quota")
+        kept = [a for a in kept if (a.owner, a.name) not in removed]
+    if total_quota_bytes > 0:
+        removed = enforce(kept, total_quota_bytes, "total_quota")
+        kept = [a for a in kept if (a.owner, a.name) not in removed]
+
+    if not dry_run:
+        _remove_empty_dirs(diagrams_dir / "generated-diagrams")
+    report = SweepReport(deleted, reclaimed, sum(1 for a in kept if a.name in protected),
+                         sum(a.size for a in kept))
+    logger.info(f"Diagram sweep{' (dry run)' if dry_run else ''}: removed {sum(deleted.values())} diagrams, "
+                f"reclaimed {report.total_reclaimed / 1024 / 1024:.1f} MB {reclaimed}, "
+                f"{report.remaining_bytes / 1024 / 1024:.1f} MB remaining")
+    return report
+
+
+def _remove_empty_dirs(store: Path):
+    if not store.is_dir():
+        return
+    for user_dir in (p for p in store.iterdir() if p.is_dir()):
+        for day_dir in (p for p in user_dir.iterdir() if p.is_dir()):
+            if not any(day_dir.iterdir()):
+                day_dir.rmdir()
+        if all(p.name == OWNER_FILE for p in user_dir.iterdir()):
+            (user_dir / OWNER_FILE).unlink(missing_ok=True)
+            try:
+                user_dir.rmdir()
+            except OSError:  # a render created a new shard meanwhile
+                pass
+
+
+def sweep_with_memory(diagrams_dir: Path, memory_factory: Callable, user_ids: Iterable[str] = (),
+                      dry_run: bool = False) -> SweepReport:
+    """
+    Sweep, protecting diagrams referenced by the memories of every user with
+    a store directory plus user_ids (e.g. active users who may own legacy files)
+    """
+    store = diagrams_dir / "generated-diagrams"
+    users = {shard_owner(p) for p in store.iterdir() if p.is_dir()} if store.is_dir() else set()
+    users.update(user_ids)
+    protected = referenced_diagrams(memory_factory(), sorted(users)) if users else set()
+    return sweep(diagrams_dir, protected, dry_run=dry_run)
+
+
+async def run_sweeper(diagrams_dir: Path, memory_factory: Callable, user_ids: Callable[[], Iterable[str]] = tuple,
+                      interval: float = DIAGRAM_SWEEP_INTERVAL):
+    """Background task: sweep every interval seconds until cancelled"""
+    import asyncio
+
+    while True:
+        try:
+            await asyncio.to_thread(sweep_with_memory, diagrams_dir, memory_factory, list(user_ids()))
+        except Exception as e:
+            logger.warning(f"Diagram sweep failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply diagram retention and quotas")
+    parser.add_argument("--diagrams-dir", default="diagrams", help="Diagrams directory")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip memory lookups (nothing is protected)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    diagrams_dir = Path(args.diagrams_dir)
+    if args.no_memory:
+        report = sweep(diagrams_dir, dry_run=args.dry_run)
+    else:
+        from memory_config import get_memory
+        report = sweep_with_memory(diagrams_dir, get_memory, dry_run=args.dry_run)
+    for reason, count in report.deleted.items():
+        print(f"{reason:<12} {count:>6} diagrams {report.reclaimed_bytes[reason] / 1024 / 1024:>9.2f} MB")
+    print(f"{'total':<12} {sum(report.deleted.values()):>6} diagrams {report.total_reclaimed / 1024 / 1024:>9.2f} MB")
+    print(f"Protected by memories: {report.protected}; remaining: {report.remaining_bytes / 1024 / 1024:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
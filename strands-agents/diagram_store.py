@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Diagram Store
+Pre-assigned, per-job artifact paths sharded by user and date. Diagram IDs
+embed their date, so (user, ID) resolves to a path without scanning.
+"""
+
+import re
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+# diagram_<YYYYMMDD>_<16 hex>
+DIAGRAM_ID_RE = re.compile(r"diagram_(\d{8})_[0-9a-f]{16}")
+
+# Variant name -> file extension
+VARIANTS = {"png": "png", "svg": "svg", "thumbnail": "thumb.png"}
+# Per-user directory marker holding the unsanitized user ID
+OWNER_FILE = ".owner"
+
+
+def new_diagram_id() -> str:
+    """Unique ID for one render job"""
+    return f"diagram_{datetime.now(timezone.utc):%Y%m%d}_{uuid.uuid4().hex[:16]}"
+
+
+def safe_user_dir(user_id: str) -> str:
+    """Filesystem-safe shard name for a user ID (user IDs may be e-mail addresses)"""
+    return re.sub(r"[^\w.@-]", "_", user_id or "default").lstrip(".") or "default"
+
+
+def shard_owner(user_dir: Path) -> str:
+    """User ID a user directory belongs to (its name for directories without a marker)"""
+    try:
+        return (user_dir / OWNER_FILE).read_text(encoding="utf-8") or user_dir.name
+    except OSError:
+        return user_dir.name
+
+
+class DiagramStore:
+    """Artifacts stored as <root>/<user>/<YYYY-MM-DD>/<diagram id>.<ext>"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def shard(self, user_id: str, diagram_id: str) -> Path:
+        match = DIAGRAM_ID_RE.fullmatch(diagram_id)
+        if not match:
+            raise ValueError(f"Invalid diagram ID: {diagram_id}")
+        day = match.group(1)
+        return self.root / safe_user_dir(user_id) / f"{day[:4]}-{day[4:6]}-{day[6:]}"
+
+    def path_for(self, user_id: str, diagram_id: str, extension: str = "png") -> Path:
+        """Where a job's artifact goes (parent directories and the owner marker are created)"""
+        directory = self.shard(user_id, diagram_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        marker = directory.parent / OWNER_FILE
+        if not marker.exists():
+            # safe_user_dir is lossy, so record who the directory belongs to
+            marker.write_text(user_id or "default", encoding="utf-8")
+        return directory / f"{diagram_id}.{extension}"
+
+    def resolve(self, user_id: str, diagram_id: str, extension: str = "png") -> Optional[Path]:
+        """Existing artifact for (user, ID), or None"""
+        try:
+            path = self.shard(user_id, diagram_id) / f"{diagram_id}.{extension}"
+        except ValueError:
+            return None
+        return path if path.is_file() else None
+
+    def variants(self, user_id: str, diagram_id: str) -> Dict[str, Path]:
+        """Existing variants of a diagram keyed by variant name"""
+        found = {}
+        for name, extension in VARIANTS.items():
+            path = self.resolve(user_id, diagram_id, extension)
+            if path:
+                found[name] = path
+        return found
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Diagram Render Worker
+Runs inside the render pool's worker processes; never import this for
+its side effects in the API process. Jobs run with CPU-time, address-space
+and wall-clock limits and a reduced set of builtins (a resource limiter,
+not a security sandbox).
+"""
+
+import builtins
+import importlib
+import math
+import os
+import re
+import signal
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-job limits (read in the worker; spawned workers inherit the environment)
+DIAGRAM_TIMEOUT = float(os.getenv("DIAGRAM_TIMEOUT", "60"))
+DIAGRAM_CPU_SECONDS = int(os.getenv("DIAGRAM_CPU_SECONDS", "30"))
+DIAGRAM_MEMORY_MB = int(os.getenv("DIAGRAM_MEMORY_MB", "1024"))
+
+# Graphviz layout engines; "auto" keeps dot for small graphs and switches to a
+# force-directed engine (fdp keeps cluster boxes, sfdp scales furthest) for large ones
+LAYOUT_ENGINES = ("dot", "neato", "fdp", "sfdp", "twopi", "circo")
+DIAGRAM_DOT_MAX_NODES = int(os.getenv("DIAGRAM_DOT_MAX_NODES", "100"))
+DIAGRAM_FDP_MAX_NODES = int(os.getenv("DIAGRAM_FDP_MAX_NODES", "300"))
+DIAGRAM_LARGE_DPI = int(os.getenv("DIAGRAM_LARGE_DPI", "72"))  # DPI for graphs auto-moved off dot
+
+# diagrams names every node with a 32-char hex ID
+_NODE_LINE_RE = re.compile(r'^\s*"?[0-9a-f]{32}"? \[', re.M)
+_EDGE_LINE_RE = re.compile(r'^\s*"?[0-9a-f]{32}"? -> ', re.M)
+_SIZE_RE = re.compile(r"^\d+(\.\d+)?,\d+(\.\d+)?!?$")
+
+# Node modules exposed to agent-written code without imports
+AWS_MODULES = (
+    "diagrams.aws.compute",
+    "diagrams.aws.database",
+    "diagrams.aws.network",
+    "diagrams.aws.storage",
+    "diagrams.aws.analytics",
+    "diagrams.aws.integration",
+    "diagrams.aws.ml",
+    "diagrams.aws.security",
+    "diagrams.aws.management",
+    "diagrams.aws.general",
+)
+
+# Built once per worker by preload()
+_base_globals: Dict[str, Any] = None
+_preload_seconds = 0.0
+_jobs_run = 0
+_last_layout: Dict[str, Any] = {}
+
+
+class RenderLimitError(RuntimeError):
+    """A render job hit its time or memory limit"""
+
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split(".")[0] != "diagrams":
+        raise ImportError(f"Only diagrams modules can be imported in diagram code (got {name!r})")
+    return importlib.__import__(name, globals, locals, fromlist, level)
+
+
+# Builtins for diagram code: drops the obvious file, eval/exec and interactive builtins and limits
+# imports to diagrams. This is NOT a sandbox: diagrams modules expose os, subprocess and their own
+# globals (e.g. diagrams.os.system), so code that means harm can escape. It only catches mistakes;
+# isolation comes from the worker process and its resource limits, and callers must trust the code.
+SAFE_BUILTINS = {name: value for name, value in vars(builtins).items()
+                 if name not in ("open", "exec", "eval", "compile", "input", "breakpoint", "help",
+                                 "exit", "quit", "globals", "locals", "vars", "memoryview")}
+SAFE_BUILTINS["__import__"] = _restricted_import
+
+
+def _raise_limit(signum, frame):
+    reason = "CPU time" if signum == getattr(signal, "SIGXCPU", None) else "wall-clock time"
+    raise RenderLimitError(f"Diagram render exceeded its {reason} limit")
+
+
+def init_worker():
+    """Pool initializer: cap the worker's address space, then preload"""
+    if resource is not None and DIAGRAM_MEMORY_MB > 0:
+        limit = DIAGRAM_MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    preload()
+
+
+def _start_limits(timeout: float):
+    """Arm the worker's per-job CPU and wall-clock limits (Graphviz gets its own, see _run_graphviz)"""
+    for name in ("SIGXCPU", "SIGALRM"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _raise_limit)
+    if resource is not None and DIAGRAM_CPU_SECONDS > 0:
+        # RLIMIT_CPU counts the whole process lifetime, so allow this job's share on top
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime) + DIAGRAM_CPU_SECONDS
+        hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    if hasattr(signal, "setitimer") and timeout > 0:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+
+def _stop_limits():
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    if resource is not None and DIAGRAM_CPU_SECONDS > 0:
+        hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _graphviz_limits():
+    """preexec_fn for Graphviz: a fixed CPU budget (a new process starts from zero CPU time)"""
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    soft = DIAGRAM_CPU_SECONDS if hard == resource.RLIM_INFINITY else min(DIAGRAM_CPU_SECONDS, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _graphviz_error(returncode: int, stderr: str) -> Optional[RenderLimitError]:
+    """RenderLimitError for a Graphviz exit caused by the CPU or memory limit, else None"""
+    if returncode in (-getattr(signal, "SIGXCPU", 0), -getattr(signal, "SIGKILL", 0)):
+        return RenderLimitError(f"Graphviz exceeded its {DIAGRAM_CPU_SECONDS}s CPU time limit")
+    # Failed allocations under RLIMIT_AS either report themselves or crash Graphviz
+    out_of_memory = any(text in stderr.lower() for text in ("out of memory", "cannot allocate", "bad_alloc"))
+    if out_of_memory or returncode in (-getattr(signal, "SIGSEGV", 0), -getattr(signal, "SIGABRT", 0)):
+        return RenderLimitError(f"Graphviz exceeded its {DIAGRAM_MEMORY_MB} MB memory limit")
+    return None
+
+
+def _run_graphviz(graph, formats: List[str]):
+    """Render graph to <filepath>.<fmt> for every format in one Graphviz run (one layout) under the per-job limits"""
+    source_path = graph.save()
+    command = ["dot", f"-K{graph.engine}"]
+    for fmt in formats:
+        command += [f"-T{fmt}", "-o", f"{source_path}.{fmt}"]
+    command.append(source_path)
+    limited = resource is not None and DIAGRAM_CPU_SECONDS > 0
+    result = subprocess.run(command, capture_output=True, text=True,
+                            preexec_fn=_graphviz_limits if limited else None)
+    if result.returncode != 0:
+        error = _graphviz_error(result.returncode, result.stderr or "")
+        if error is not None:
+            raise error
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+
+
+def layout_options(engine: str = "auto", dpi: Optional[int] = None, size: Optional[str] = None) -> Dict[str, Any]:
+    """Validated layout options for render_job; raises ValueError"""
+    if engine != "auto" and engine not in LAYOUT_ENGINES:
+        raise ValueError(f"Unknown layout engine {engine!r}; use auto or one of {', '.join(LAYOUT_ENGINES)}")
+    if dpi is not None and not 36 <= dpi <= 600:
+        raise ValueError(f"dpi must be between 36 and 600 (got {dpi})")
+    if size is not None and not _SIZE_RE.match(size):
+        raise ValueError(f"size must be 'width,height' in inches, optionally ending in '!' (got {size!r})")
+    return {"engine": engine, "dpi": dpi, "size": size}
+
+
+def graph_size(source: str) -> Dict[str, int]:
+    """Node, edge and cluster counts of a diagrams-generated DOT source"""
+    return {"nodes": len(_NODE_LINE_RE.findall(source)), "edges": len(_EDGE_LINE_RE.findall(source)),
+            "clusters": source.count("subgraph ")}
+
+
+def choose_engine(nodes: int, clusters: int) -> str:
+    if nodes <= DIAGRAM_DOT_MAX_NODES:
+        return "dot"
+    return "fdp" if clusters and nodes <= DIAGRAM_FDP_MAX_NODES else "sfdp"
+
+
+def _apply_layout(graph, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Set engine, DPI and size on a graphviz graph just before it renders"""
+    size = graph_size(graph.source)
+    engine = options.get("engine", "auto")
+    dpi = options.get("dpi")
+    if engine == "auto":
+        engine = choose_engine(size["nodes"], size["clusters"])
+        if engine != "dot" and dpi is None:
+            dpi = DIAGRAM_LARGE_DPI
+    if engine != "dot" and graph.graph_attr.get("splines") == "ortho":
+        # diagrams defaults to orthogonal edges, which only dot routes well and which dominate its time
+        graph.graph_attr["splines"] = "spline"
+    graph.engine = engine
+    if dpi:
+        graph.graph_attr["dpi"] = str(dpi)
+    if options.get("size"):
+        graph.graph_attr["size"] = options["size"]
+    return {**size, "engine": engine, "dpi": dpi}
+
+
+def _public_names(module) -> Dict[str, Any]:
+    """What `from module import *` would bind"""
+    names = getattr(module, "__all__", None) or [name for name in vars(module) if not name.startswith("_")]
+    return {name: getattr(module, name) for name in names}
+
+
+def preload():
+    """Import diagrams and the AWS node modules and build the shared job namespace (pool initializer)"""
+    global _base_globals, _preload_seconds
+    if _base_globals is not None:
+        return
+    start = time.perf_counter()
+    import diagrams
+
+    namespace = {"Diagram": diagrams.Diagram, "Cluster": diagrams.Cluster, "Edge": diagrams.Edge}
+    for name in AWS_MODULES:
+        namespace.update(_public_names(importlib.import_module(name)))
+    _base_globals = namespace
+    _preload_seconds = time.perf_counter() - start
+
+
+def _scratch_diagram_class(job_dir: str, formats: Optional[List[str]] = None,
+                           layout: Optional[Dict[str, Any]] = None):
+    """Diagram subclass that always writes into job_dir in the given formats and layout and never opens a viewer"""
+    import diagrams
+
+    base = getattr(diagrams, "_OriginalDiagram", diagrams.Diagram)
+    diagrams._OriginalDiagram = base
+
+    class ScratchDiagram(base):
+        def __init__(self, name: str = "", filename: str = "", *args, **kwargs):
+            filename = os.path.basename(filename or "_".join(name.split()).lower() or "diagram")
+            kwargs["show"] = False
+            if formats:
+                kwargs["outformat"] = formats
+            super().__init__(name, os.path.join(job_dir, filename), *args, **kwargs)
+
+        def render(self):
+            # Replaces Diagram.render so Graphviz runs with its own fixed limits (see _run_graphviz)
+            global _last_layout
+            _last_layout = _apply_layout(self.dot, layout or {})
+            _run_graphviz(self.dot, self.outformat if isinstance(self.outformat, list) else [self.outformat])
+
+    return ScratchDiagram
+
+
+def _write_thumbnails(job_dir: str, width: int):
+    """Write <stem>.thumb.png beside each PNG (skipped when Pillow is not installed)"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return
+    for path in Path(job_dir).glob("*.png"):
+        with Image.open(path) as image:
+            image.thumbnail((width, width * 4))
+            image.save(path.with_name(f"{path.stem}.thumb.png"), optimize=True)
+
+
+def render_job(code: str, job_dir: str, aws_namespace: bool = False,
+               formats: Optional[List[str]] = None, thumbnail_width: int = 0,
+               layout: Optional[Dict[str, Any]] = None, timeout: float = DIAGRAM_TIMEOUT) -> Dict[str, Any]:
+    """
+    Execute diagram code with all output redirected to job_dir.
+
+    The worker process runs one job at a time, so pointing diagrams.Diagram
+    at a per-job subclass is safe here and keeps the working directory
+    untouched. With aws_namespace the code starts from a copy of the
+    preloaded globals instead of importing the node modules itself.
+    formats overrides the diagram's outformat; thumbnail_width > 0 adds a
+    downscaled copy of each PNG. layout comes from layout_options(); the
+    auto engine is picked from the rendered graph's size. Jobs exceeding timeout, DIAGRAM_CPU_SECONDS
+    or DIAGRAM_MEMORY_MB raise RenderLimitError.
+
+    Returns:
+        dict: produced file names, the layout used (engine, dpi, graph size),
+        plus preload (first job in this worker only), setup and exec timings
+        in seconds
+    """
+    global _jobs_run, _last_layout
+    import diagrams
+
+    setup_start = time.perf_counter()
+    preload_seconds = 0.0
+    if aws_namespace:
+        if _base_globals is None:
+            preload()
+        preload_seconds = _preload_seconds if _jobs_run == 0 else 0.0
+    _last_layout = {}
+    scratch_diagram = _scratch_diagram_class(job_dir, formats, layout)
+    namespace = dict(_base_globals) if aws_namespace else {}
+    namespace.update(__name__="__diagram__", __builtins__=SAFE_BUILTINS, Diagram=scratch_diagram)
+    diagrams.Diagram = scratch_diagram
+    setup_seconds = time.perf_counter() - setup_start
+
+    exec_start = time.perf_counter()
+    _start_limits(timeout)
+    try:
+        exec(code, namespace)
+        if thumbnail_width:
+            _write_thumbnails(job_dir, thumbnail_width)
+    except MemoryError:
+        raise RenderLimitError(f"Diagram render exceeded its {DIAGRAM_MEMORY_MB} MB memory limit") from None
+    finally:
+        _stop_limits()
+        diagrams.Diagram = diagrams._OriginalDiagram
+        _jobs_run += 1
+    return {
+        "files": sorted(path.name for path in Path(job_dir).iterdir()
+                        if path.is_file() and not path.name.startswith(".")),
+        "layout": _last_layout,
+        "preload_s": preload_seconds,
+        "setup_s": setup_seconds,
+        "exec_s": time.perf_counter() - exec_start,
+    }
+
+
+def serve(conn):
+    """
+    Worker process main loop (started by the generator's RenderPool).
+    Receives (function, args) jobs; acknowledges each with ("started", pid)
+    so the parent's deadline starts with the job, then replies ("done",
+    result) or ("error", exception). Exits when the pipe closes or on None.
+    """
+    init_worker()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        func, args = job
+        conn.send(("started", os.getpid()))
+        try:
+            reply = ("done", func(*args))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e:  # unpicklable result or exception
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+def node_types() -> List[str]:
+    """Node classes agent-written code can use without imports"""
+    preload()
+    return sorted(name for name, value in _base_globals.items()
+                  if isinstance(value, type) and name not in ("Diagram", "Cluster", "Edge"))
+
+
+def warm_up() -> float:
+    """No-op job that forces a worker to start; returns its preload time"""
+    preload()
+    return _preload_seconds
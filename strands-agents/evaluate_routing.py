@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Evaluate Model Routing
+Measures routing accuracy against a recorded query set
+"""
+
+import argparse
+import json
+from collections import Counter
+from model_router import TIER_ORDER, ModelRouter
+
+
+def load_queries(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate model routing accuracy")
+    parser.add_argument("--queries", default="routing_queries.jsonl", help="JSONL of {message, expected}")
+    parser.add_argument("--classifier", action="store_true", help="Use the Nova Micro classifier for uncertain queries")
+    parser.add_argument("--verbose", action="store_true", help="Print every misrouted query")
+    args = parser.parse_args()
+
+    router = ModelRouter(use_classifier=args.classifier)
+    queries = load_queries(args.queries)
+    confusion = Counter()
+    reasons = Counter()
+    misses = []
+
+    for query in queries:
+        decision = router.route(query["message"])
+        confusion[(query["expected"], decision.tier)] += 1
+        reasons[decision.reason] += 1
+        if decision.tier != query["expected"]:
+            misses.append((query["message"], query["expected"], decision))
+
+    correct = sum(n for (expected, actual), n in confusion.items() if expected == actual)
+    under = sum(n for (expected, actual), n in confusion.items()
+                if TIER_ORDER.index(actual) < TIER_ORDER.index(expected))
+    print(f"Accuracy: {correct}/{len(queries)} ({correct / len(queries):.0%})")
+    print(f"Under-routed (too small a model): {under}, over-routed: {len(queries) - correct - under}")
+    print(f"Decision sources: {dict(reasons)}")
+
+    print(f"\n{'expected / routed':<18}" + "".join(f"{tier:>9}" for tier in TIER_ORDER))
+    for expected in TIER_ORDER:
+        print(f"{expected:<18}" + "".join(f"{confusion[(expected, actual)]:>9}" for actual in TIER_ORDER))
+
+    if args.verbose and misses:
+        print("\nMisrouted:")
+        for message, expected, decision in misses:
+            print(f"  [{expected} -> {decision.tier} ({decision.reason})] {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Fast Path for Deterministic Utility Intents
+Answers calculator, time and letter-count requests without an LLM call
+"""
+
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+
+
+class Intent(NamedTuple):
+    tool_name: str
+    arguments: Dict[str, Any]
+    format_reply: Callable[[str], str]
+
+
+_CALCULATE_RE = re.compile(
+    r"^\s*(?:please\s+)?(?:calculate|compute|evaluate|what(?:'s| is))\s+"
+    r"(?P<expression>[-\d(][\d\s.+\-*/^()%]*?)\s*[?.!]?\s*$", re.I)
+_OPERATOR_RE = re.compile(r"\d\s*[-+*/^%]\s*[\d(]")
+_TIME_RE = re.compile(
+    r"^\s*(?:what(?:'s| is) the (?:current )?time|what time is it|current time)"
+    r"(?:\s+(?:in|for)\s+(?P<timezone>[A-Za-z_]+(?:/[A-Za-z_]+)*|UTC|GMT))?\s*(?:now)?\s*[?.!]?\s*$", re.I)
+_LETTER_RE = re.compile(
+    r"^\s*(?:please\s+)?count\s+(?:the\s+)?(?:letter\s+)?['\"]?(?P<letter>[A-Za-z])['\"]?(?:'s)?\s+in\s+"
+    r"(?:the\s+word\s+)?['\"]?(?P<word>[A-Za-z]+)['\"]?\s*[?.!]?\s*$", re.I)
+
+_RESULT_PREFIX_RE = re.compile(r"^Result:\s*")
+
+
+def _tool_text(result: Dict[str, Any]) -> str:
+    return " ".join(str(c.get("text", "")) for c in result.get("content", [])).strip()
+
+
+def match_intent(message: str) -> Optional[Intent]:
+    """Map a message onto a single deterministic tool call, or None"""
+    match = _CALCULATE_RE.match(message)
+    if match and _OPERATOR_RE.search(match.group("expression")):
+        expression = match.group("expression").strip()
+        return Intent("calculator", {"expression": expression},
+                      lambda text: f"{expression} = {_RESULT_PREFIX_RE.sub('', text)}")
+
+    match = _TIME_RE.match(message)
+    if match:
+        arguments = {"timezone": match.group("timezone")} if match.group("timezone") else {}
+        return Intent("current_time", arguments, lambda text: f"The current time is {text}.")
+
+    match = _LETTER_RE.match(message)
+    if match:
+        letter, word = match.group("letter"), match.group("word")
+        return Intent("letter_counter", {"word": word, "letter": letter},
+                      lambda text: f"The letter '{letter}' appears {text} time(s) in '{word}'.")
+    return None
+
+
+@traced("fast_path")
+def run_fast_path(agent, message: str) -> Optional[str]:
+    """
+    Answer a message by calling its tool directly and record the exchange.
+
+    Returns None when the message is not a fast-path intent, the tool is not
+    registered on the agent, or the tool fails, so the caller can fall back
+    to the LLM.
+    """
+    intent = match_intent(message)
+    if intent is None or intent.tool_name not in agent.tool_names:
+        return None
+
+    try:
+        tool = getattr(agent.tool, intent.tool_name)
+        result = tool(**intent.arguments, record_direct_tool_call=False)
+    except Exception as e:
+        logger.warning(f"Fast path {intent.tool_name} failed, falling back to LLM: {e}")
+        return None
+    if result.get("status") != "success":
+        return None
+
+    reply = intent.format_reply(_tool_text(result))
+
+    # Keep history consistent with an ordinary user/assistant turn
+    agent.messages.append({"role": "user", "content": [{"text": message}]})
+    agent.messages.append({"role": "assistant", "content": [{"text": reply}]})
+    agent.conversation_manager.apply_management(agent)
+
+    logger.info(f"Fast path answered with {intent.tool_name}")
+    return reply
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+HTTP Session for API Calls
+One pooled, keep-alive requests.Session for the Streamlit client, with
+retries and backoff on idempotent calls and compressed responses
+"""
+
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))  # kept-alive connections per host
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.5"))  # seconds, doubled per retry
+
+# Load balancer and restart errors worth retrying
+RETRY_STATUSES = (502, 503, 504)
+
+
+def create_http_session(pool_size: int = API_POOL_SIZE, retries: int = API_RETRIES,
+                        backoff: float = API_RETRY_BACKOFF) -> requests.Session:
+    """
+    Session whose connections are kept alive and reused across calls.
+
+    Failed connects are retried for every method, since nothing was sent;
+    read errors and RETRY_STATUSES only for idempotent methods (GET,
+    DELETE, ...), so a chat POST is never run twice. requests already
+    asks for gzip/deflate, and br when brotli is installed.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -10,6 +10,9 @@ from typing import Optional
 from strands import Agent, tool
 from strands_tools import calculator, current_time
 import boto3
+from aws_clients import get_account_id, get_region
+from s3_inventory import s3_inventory
+from model_router import RoutingHook, get_model_router
 
 # Configure logging
 logging.basicConfig(
@@ -22,46 +25,22 @@ logger = logging.getLogger(__name__)
 os.environ.setdefault('AWS_REGION', 'us-east-1')
 
 @tool
-def aws_account_info() -> str:
+def aws_account_info(refresh: bool = False) -> str:
     """
     Get current AWS account information.
     
+    Args:
+        refresh (bool): Bypass the cache and query AWS again
+    
     Returns:
         str: AWS account ID and region information
     """
     try:
-        sts_client = boto3.client('sts')
-        response = sts_client.get_caller_identity()
-        account_id = response.get('Account', 'Unknown')
-        
-        # Get current region
-        session = boto3.Session()
-        region = session.region_name or 'Unknown'
-        
-        return f"AWS Account ID: {account_id}, Region: {region}"
+        # Account ID is cached per region; the session region needs no API call
+        return f"AWS Account ID: {get_account_id(refresh)}, Region: {get_region()}"
     except Exception as e:
         return f"Error getting AWS info: {str(e)}"
 
-@tool
-def list_s3_buckets() -> str:
-    """
-    List S3 buckets in the current AWS account.
-    
-    Returns:
-        str: List of S3 bucket names
-    """
-    try:
-        s3_client = boto3.client('s3')
-        response = s3_client.list_buckets()
-        
-        if not response.get('Buckets'):
-            return "No S3 buckets found in this account."
-        
-        bucket_names = [bucket['Name'] for bucket in response['Buckets']]
-        return f"S3 Buckets ({len(bucket_names)}): {', '.join(bucket_names)}"
-    except Exception as e:
-        return f"Error listing S3 buckets: {str(e)}"
-
 @tool
 def letter_counter(word: str, letter: str) -> int:
     """
@@ -115,14 +94,16 @@ def create_strands_agent() -> Agent:
         current_time,
         letter_counter,
         aws_account_info,
-        list_s3_buckets,
+        s3_inventory,
         system_info
     ]
     
-    # Create agent with accessible Bedrock model
+    # Start on Premier; each turn is re-routed to the smallest capable Nova model
+    router = get_model_router()
     agent = Agent(
         tools=tools,
-        model="us.amazon.nova-premier-v1:0"  # Using accessible model
+        model=router.models["premier"],
+        hooks=[RoutingHook(router)]
     )
     
     return agent
@@ -149,6 +130,7 @@ def test_agent():
         print('='*60)
         
         try:
+            get_model_router().apply(agent, query)
             result = agent(query)
             print(f"Response: {result}")
         except Exception as e:
@@ -193,6 +175,7 @@ def main():
                 continue
             
             print(f"\nAgent response:")
+            get_model_router().apply(agent, user_input)
             result = agent(user_input)
             print(result)
             
@@ -1,41 +1,196 @@
 #!/usr/bin/env python3
 """
 MCP Client for AWS Diagram Server Integration
+
+Prefers a locally installed, pinned server binary so spawning never
+resolves packages or touches the network. Tool schemas from load_tools
+are cached on disk, keyed by a hash of the server build, so agents can be
+built from the cache while the server starts in the background.
 """
 
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import shutil
 import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
 from mcp import stdio_client, StdioServerParameters
-from strands.tools.mcp import MCPClient
+from mcp.types import Tool
+from strands.tools.mcp import MCPAgentTool, MCPClient
 
 logger = logging.getLogger(__name__)
 
+SERVER_PACKAGE = "awslabs.aws-diagram-mcp-server"
+# Installed server executable (e.g. from `uv tool install awslabs.aws-diagram-mcp-server==<version>`);
+# when unset, the package's executable is used if it is on PATH
+DIAGRAM_MCP_SERVER_BIN = os.getenv("DIAGRAM_MCP_SERVER_BIN", "")
+# Version uvx runs when no binary is installed; "latest" re-resolves on every spawn
+DIAGRAM_MCP_SERVER_VERSION = os.getenv("DIAGRAM_MCP_SERVER_VERSION") or "latest"
+# Run uvx from its local cache only
+DIAGRAM_MCP_OFFLINE = os.getenv("DIAGRAM_MCP_OFFLINE", "false").lower() == "true"
+DIAGRAM_MCP_STARTUP_TIMEOUT = os.getenv("DIAGRAM_MCP_STARTUP_TIMEOUT", "")  # default: 30 for a binary, 120 for uvx
+DIAGRAM_MCP_SCHEMA_CACHE = os.getenv("DIAGRAM_MCP_SCHEMA_CACHE", "true").lower() == "true"
+DIAGRAM_MCP_CACHE_DIR = os.getenv("DIAGRAM_MCP_CACHE_DIR", ".mcp_cache")
+
+# Clients created in this process, for the MCP subprocess gauge
+_clients = []
+
+def running_mcp_clients() -> int:
+    """Number of MCP clients whose server subprocess is running"""
+    count = 0
+    for client in _clients:
+        thread = getattr(client, "_background_thread", None)
+        if thread is not None and thread.is_alive():
+            count += 1
+    return count
+
+def server_command() -> Tuple[str, List[str], Optional[str]]:
+    """
+    How to launch the diagram server.
+
+    Returns:
+        tuple: (command, args, version hash). The hash identifies the server
+        build for the schema cache and is None when each spawn may run a
+        different build (uvx @latest).
+    """
+    binary = DIAGRAM_MCP_SERVER_BIN or shutil.which(SERVER_PACKAGE)
+    if binary:
+        path = os.path.realpath(shutil.which(binary) or binary)
+        stat = os.stat(path)
+        # Reinstalling or upgrading the tool rewrites its entry point
+        identity = f"bin:{path}:{stat.st_size}:{stat.st_mtime_ns}:{DIAGRAM_MCP_SERVER_VERSION}"
+        return path, [], hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    spec = f"{SERVER_PACKAGE}@{DIAGRAM_MCP_SERVER_VERSION}"
+    offline = ["--offline"] if DIAGRAM_MCP_OFFLINE else []
+    # Windows requires different command format to avoid SIGALRM issues
+    if sys.platform == "win32":
+        command, args = "uv", ["tool", "run", *offline, "--from", spec, f"{SERVER_PACKAGE}.exe"]
+    else:
+        command, args = "uvx", [*offline, spec]
+    if DIAGRAM_MCP_SERVER_VERSION == "latest":
+        return command, args, None
+    return command, args, hashlib.sha256(f"uvx:{spec}".encode("utf-8")).hexdigest()
+
+class CachedSchemaMCPClient(MCPClient):
+    """
+    MCPClient that answers load_tools from the on-disk schema cache.
+
+    With a cache hit the server handshake runs on a background thread and
+    tool calls wait for it; without one, load_tools behaves like MCPClient
+    and writes the cache once the server has listed its tools.
+    """
+
+    def __init__(self, transport_callable, version_hash: str, cache_dir: str = DIAGRAM_MCP_CACHE_DIR,
+                 startup_timeout: int = 30):
+        super().__init__(transport_callable, startup_timeout=startup_timeout)
+        self.version_hash = version_hash
+        self.cache_path = Path(cache_dir) / f"diagram_tools_{version_hash[:16]}.json"
+        self._cached_schemas = None
+        self._starter = None
+        self._starter_lock = threading.Lock()
+
+    def _read_cache(self) -> Optional[List[dict]]:
+        if self._cached_schemas is None and self.cache_path.exists():
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version_hash") == self.version_hash:
+                    self._cached_schemas = data["tools"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable MCP schema cache {self.cache_path}: {e}")
+        return self._cached_schemas
+
+    def _write_cache(self, tools):
+        schemas = [tool.mcp_tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+        if schemas == self._cached_schemas:
+            return
+        if self._cached_schemas is not None:
+            logger.warning("Diagram MCP server tool schemas changed since they were cached; updating cache")
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version_hash": self.version_hash, "tools": schemas}, f)
+        os.replace(tmp, self.cache_path)
+        self._cached_schemas = schemas
+
+    def _start_in_background(self):
+        with self._starter_lock:
+            if self._starter is None or not self._starter.is_alive():
+                self._starter = threading.Thread(target=self._connect, name="mcp-diagram-start", daemon=True)
+                self._starter.start()
+
+    def _connect(self):
+        start = time.perf_counter()
+        try:
+            tools = asyncio.run(MCPClient.load_tools(self))
+            logger.info(f"Diagram MCP server ready in {time.perf_counter() - start:.1f}s")
+            self._write_cache(tools)
+        except Exception as e:
+            logger.error(f"Diagram MCP server failed to start: {e}")
+
+    def _wait_for_server(self):
+        starter = self._starter
+        if starter is not None and starter.is_alive():
+            starter.join()
+
+    async def load_tools(self, **kwargs):
+        if not self._tool_provider_started:
+            cached = self._read_cache()
+            if cached is not None:
+                self._start_in_background()
+                return [MCPAgentTool(Tool.model_validate(schema), self) for schema in cached]
+        tools = await super().load_tools(**kwargs)
+        self._write_cache(tools)
+        return tools
+
+    async def call_tool_async(self, *args, **kwargs):
+        await asyncio.to_thread(self._wait_for_server)
+        return await super().call_tool_async(*args, **kwargs)
+
+    def call_tool_sync(self, *args, **kwargs):
+        self._wait_for_server()
+        return super().call_tool_sync(*args, **kwargs)
+
 def get_diagram_mcp_client():
     """Get AWS Diagram MCP client as ToolProvider"""
     try:
         logger.info("Initializing AWS Diagram MCP client...")
-        
-        # Windows requires different command format to avoid SIGALRM issues
-        if sys.platform == "win32":
-            command = "uv"
-            args = ["tool", "run", "--from", "awslabs.aws-diagram-mcp-server@latest", "awslabs.aws-diagram-mcp-server.exe"]
+
+        command, args, version_hash = server_command()
+        startup_timeout = int(DIAGRAM_MCP_STARTUP_TIMEOUT or (120 if command in ("uv", "uvx") else 30))
+
+        def transport():
+            return stdio_client(StdioServerParameters(command=command, args=args))
+
+        if DIAGRAM_MCP_SCHEMA_CACHE and version_hash:
+            mcp_client = CachedSchemaMCPClient(transport, version_hash, startup_timeout=startup_timeout)
         else:
-            command = "uvx"
-            args = ["awslabs.aws-diagram-mcp-server@latest"]
-        
-        mcp_client = MCPClient(
-            lambda: stdio_client(
-                StdioServerParameters(
-                    command=command,
-                    args=args
-                )
-            ),
-            startup_timeout=120
-        )
-        
-        logger.info("AWS Diagram MCP client initialized successfully")
+            if DIAGRAM_MCP_SCHEMA_CACHE:
+                logger.info("Diagram MCP server is unpinned; tool schemas will not be cached")
+            mcp_client = MCPClient(transport, startup_timeout=startup_timeout)
+
+        _clients.append(mcp_client)
+        logger.info(f"AWS Diagram MCP client initialized successfully ({command} {' '.join(args)})")
         return mcp_client
-                
+
     except Exception as e:
         logger.error(f"Failed to initialize MCP client: {e}", exc_info=True)
         return None
+
+if __name__ == "__main__":
+    # Refresh the schema cache, e.g. after installing or upgrading the server
+    logging.basicConfig(level=logging.INFO)
+    client = get_diagram_mcp_client()
+    if isinstance(client, CachedSchemaMCPClient):
+        client.cache_path.unlink(missing_ok=True)
+        tools = asyncio.run(client.load_tools())
+        print(f"Cached {len(tools)} tool schemas in {client.cache_path}")
+        client.stop(None, None, None)
+    else:
+        print("Schema cache is disabled or the server is unpinned; set DIAGRAM_MCP_SERVER_BIN or DIAGRAM_MCP_SERVER_VERSION")
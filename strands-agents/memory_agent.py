@@ -5,14 +5,25 @@ Provides personalized AI interactions with persistent memory
 """
 
 import os
+import asyncio
 import logging
+import threading
 from typing import Optional, Dict, Any, List
 from strands import Agent, tool
 from strands_tools import calculator, current_time
 import boto3
-import json
 from memory_config import get_memory
-from diagram_generator import create_diagram_tool
+from memory_index import get_keyword_index, search_memories
+from conversation_manager import create_conversation_manager
+from aws_clients import get_account_id, get_region
+from s3_inventory import s3_inventory
+from tool_runtime import OrderedConcurrentToolExecutor, ToolTimingHook, run_io
+from model_router import MODEL_TIERS, RoutingHook, get_model_router
+from fast_path import FAST_PATH_ENABLED, run_fast_path
+from metrics import AGENT_TURN_SECONDS, timed
+from tracing import span
+from diagram_generator import get_diagram_generator, get_node_types
+from diagram_model import edit_diagram
 from mcp_diagram_client import get_diagram_mcp_client
 import sys
 
@@ -27,20 +38,22 @@ logger = logging.getLogger(__name__)
 memory = get_memory()
 
 @tool
-def search_memory(query: str, user_id: str = "default") -> str:
+async def search_memory(query: str, user_id: str = "default", mode: str = "hybrid") -> str:
     """
     Search through user's memory for relevant information.
     
     Args:
         query (str): Search query to find relevant memories
         user_id (str): User identifier for personalized memory
+        mode (str): "keyword" for exact names (buckets, services, people),
+            "vector" for semantic questions, "hybrid" to combine both
         
     Returns:
         str: Relevant memories or indication if none found
     """
     try:
-        result = memory.search(query, user_id=user_id, limit=5)
-        memories = result.get('results', []) if isinstance(result, dict) else result
+        memories = await run_io("search_memory", search_memories, memory, query,
+                                user_id=user_id, limit=5, mode=mode)
         if memories:
             memory_text = "\n".join([f"- {mem['memory']}" for mem in memories])
             return f"Found relevant memories:\n{memory_text}"
@@ -48,8 +61,14 @@ def search_memory(query: str, user_id: str = "default") -> str:
     except Exception as e:
         return f"Error searching memory: {str(e)}"
 
+def _add_memory(content: str, user_id: str):
+    """Add to Mem0 and mirror the result into the keyword index"""
+    result = memory.add(content, user_id=user_id)
+    get_keyword_index(memory).apply_add_result(user_id, result)
+    return result
+
 @tool
-def save_memory(content: str, user_id: str = "default") -> str:
+async def save_memory(content: str, user_id: str = "default") -> str:
     """
     Save important information to user's memory.
     
@@ -61,13 +80,13 @@ def save_memory(content: str, user_id: str = "default") -> str:
         str: Confirmation of memory save
     """
     try:
-        result = memory.add(content, user_id=user_id)
+        await run_io("save_memory", _add_memory, content, user_id)
         return f"Successfully saved to memory"
     except Exception as e:
         return f"Error saving memory: {str(e)}"
 
 @tool
-def get_user_preferences(user_id: str = "default") -> str:
+async def get_user_preferences(user_id: str = "default") -> str:
     """
     Retrieve user preferences and personal information.
     
@@ -78,7 +97,8 @@ def get_user_preferences(user_id: str = "default") -> str:
         str: User preferences and personal details
     """
     try:
-        result = memory.search("preferences likes dislikes favorite", user_id=user_id, limit=10)
+        result = await run_io("get_user_preferences", memory.search,
+                              "preferences likes dislikes favorite", user_id=user_id, limit=10)
         preferences = result.get('results', []) if isinstance(result, dict) else result
         if preferences:
             pref_text = "\n".join([f"- {mem['memory']}" for mem in preferences])
@@ -88,30 +108,59 @@ def get_user_preferences(user_id: str = "default") -> str:
         return f"Error retrieving preferences: {str(e)}"
 
 @tool
-def aws_account_info() -> str:
-    """Get current AWS account information."""
+async def aws_account_info(refresh: bool = False) -> str:
+    """
+    Get current AWS account information.
+    
+    Args:
+        refresh (bool): Bypass the cache and query AWS again
+    """
     try:
-        sts_client = boto3.client('sts')
-        response = sts_client.get_caller_identity()
-        account_id = response.get('Account', 'Unknown')
-        session = boto3.Session()
-        region = session.region_name or 'Unknown'
-        return f"AWS Account ID: {account_id}, Region: {region}"
+        account_id = await run_io("aws_account_info", get_account_id, refresh)
+        return f"AWS Account ID: {account_id}, Region: {get_region()}"
     except Exception as e:
         return f"Error getting AWS info: {str(e)}"
 
+def _edit_and_render(user_id: str, operations: List[Dict[str, Any]], engine: str = "auto",
+                     dpi: Optional[int] = None, size: Optional[str] = None):
+    generator = get_diagram_generator()
+    return edit_diagram(user_id, operations, lambda code: generator.generate_diagram(
+        code, aws_namespace=True, user_id=user_id, engine=engine, dpi=dpi, size=size),
+        node_types=get_node_types())
+
 @tool
-def list_s3_buckets() -> str:
-    """List S3 buckets in the current AWS account."""
+async def update_diagram(operations: List[Dict[str, Any]], user_id: str = "default", engine: str = "auto",
+                         dpi: Optional[int] = None, size: Optional[str] = None) -> str:
+    """
+    Edit the user's current architecture diagram with small operations and re-render it.
+    Prefer this over writing diagram code when changing the previous diagram.
+    Node types are diagrams.aws class names (Lambda, APIGateway, Dynamodb, S3, EC2, RDS, ...).
+    Operations (applied in order):
+    {"op": "add_node", "id": "db", "type": "Dynamodb", "label": "Orders", "cluster": "backend"}
+    {"op": "remove_node", "id": "db"}
+    {"op": "connect", "source": "api", "target": "db", "label": "writes"}
+    {"op": "disconnect", "source": "api", "target": "db"}
+    {"op": "add_cluster", "id": "backend", "label": "Backend", "parent": "vpc"}
+    {"op": "remove_cluster", "id": "backend"}
+    {"op": "set_title", "title": "Serverless App"}
+    {"op": "set_direction", "direction": "LR"}
+    {"op": "reset"} to start a new diagram
+    
+    Args:
+        operations (list): Patch operations; pass [] to see the current diagram
+        user_id (str): User identifier
+        engine (str): Layout engine: auto (default), dot, neato, fdp, sfdp, twopi or circo
+        dpi (int): Output resolution, e.g. 72 for large diagrams or 150 for print
+        size (str): Maximum "width,height" in inches, e.g. "20,12"
+        
+    Returns:
+        str: Rendered diagram path and the resulting diagram structure
+    """
     try:
-        s3_client = boto3.client('s3')
-        response = s3_client.list_buckets()
-        if not response.get('Buckets'):
-            return "No S3 buckets found in this account."
-        bucket_names = [bucket['Name'] for bucket in response['Buckets']]
-        return f"S3 Buckets ({len(bucket_names)}): {', '.join(bucket_names)}"
+        path, model = await run_io("update_diagram", _edit_and_render, user_id, operations, engine, dpi, size)
+        return f"Diagram rendered: {path}\nCurrent diagram: {model.summary()}"
     except Exception as e:
-        return f"Error listing S3 buckets: {str(e)}"
+        return f"Error updating diagram: {str(e)}"
 
 @tool
 def letter_counter(word: str, letter: str) -> int:
@@ -138,7 +187,7 @@ def system_info() -> str:
     return '\n'.join([f"{key}: {value}" for key, value in info.items()])
 
 @tool
-def personalized_greeting(user_id: str = "default") -> str:
+async def personalized_greeting(user_id: str = "default") -> str:
     """
     Generate a personalized greeting based on user's memory.
     
@@ -149,12 +198,13 @@ def personalized_greeting(user_id: str = "default") -> str:
         str: Personalized greeting message
     """
     try:
-        # Search for user's name and preferences
-        name_result = memory.search("name called", user_id=user_id, limit=3)
-        name_memories = name_result.get('results', []) if isinstance(name_result, dict) else name_result
-        
-        pref_result = memory.search("likes enjoys favorite", user_id=user_id, limit=3)
-        pref_memories = pref_result.get('results', []) if isinstance(pref_result, dict) else pref_result
+        # Search for user's name and preferences concurrently
+        name_memories, pref_memories = await asyncio.gather(
+            run_io("personalized_greeting", search_memories, memory, "name called",
+                   user_id=user_id, limit=3, mode="keyword"),
+            run_io("personalized_greeting", search_memories, memory, "likes enjoys favorite",
+                   user_id=user_id, limit=3)
+        )
         
         greeting = "Hello"
         if name_memories:
@@ -173,47 +223,19 @@ def personalized_greeting(user_id: str = "default") -> str:
     except Exception as e:
         return f"Hello! Error retrieving personalized info: {str(e)}"
 
-def create_memory_agent(user_id: str = "default") -> Agent:
-    """
-    Create and configure a Strands agent with memory capabilities.
-    
-    Args:
-        user_id (str): User identifier for personalized memory
-        
-    Returns:
-        Agent: Configured memory-enabled Strands agent
-    """
-    tools = [
-        calculator,
-        current_time,
-        search_memory,
-        save_memory,
-        aws_account_info,
-        list_s3_buckets
-    ]
-    
-    # Add diagram generation tool (Windows-compatible)
-    try:
-        mcp_client = get_diagram_mcp_client()
-        if mcp_client:
-            tools.append(mcp_client)
-            logger.info("Added AWS Diagram MCP client")
-    except Exception as e:
-        logger.warning(f"Could not load MCP client: {e}")
-    
-    import os
-    diagrams_dir = os.path.abspath("diagrams")
-    
-    system_prompt = f"""
+MODEL_ID = MODEL_TIERS["premier"]
+
+SYSTEM_PROMPT_TEMPLATE = """
 You are a helpful AI assistant with memory and diagram generation capabilities.
 
 When users share personal info (name, preferences, goals), save it using save_memory.
-When users ask about past conversations, use search_memory.
+When users ask about past conversations, use search_memory (mode="keyword" for exact names like buckets or services).
+If a message already includes "Relevant memories", answer from them and only call search_memory if they are not enough.
 When users ask to create or modify diagrams, use diagram tools and search memory for previous diagram context.
 
 For diagrams:
-1. Use MCP tools to create AWS architecture diagrams
-2. IMPORTANT: Always pass workspace_dir="{diagrams_dir}" to generate_diagram tool
+1. Use update_diagram to build or change the user's diagram with small operations; to modify the previous diagram send only the changes (e.g. one add_node and one connect)
+2. Use MCP tools for diagrams update_diagram cannot express; IMPORTANT: always pass workspace_dir="{diagrams_dir}" to the generate_diagram tool
 3. Search memory for previous diagrams to iterate
 4. Save diagram context to memory
 5. After generation, extract the filename from the response and inform user
@@ -222,14 +244,227 @@ User: {user_id}
 
 Be concise. No thinking tags.
     """
+
+class AgentRegistry:
+    """
+    Process-wide, immutable agent configuration.
+    
+    Tool objects, the MCP client, the Bedrock model client and the rendered
+    system prompt are built once and shared by every per-user agent, so an
+    agent only carries its user id and conversation state.
+    """
+    
+    def __init__(self):
+        tools = [
+            calculator,
+            current_time,
+            letter_counter,
+            search_memory,
+            save_memory,
+            aws_account_info,
+            s3_inventory,
+            update_diagram
+        ]
+        
+        # Add diagram generation tool (Windows-compatible)
+        try:
+            mcp_client = get_diagram_mcp_client()
+            if mcp_client:
+                tools.append(mcp_client)
+                logger.info("Added AWS Diagram MCP client")
+        except Exception as e:
+            logger.warning(f"Could not load MCP client: {e}")
+        
+        self.tools = tuple(tools)
+        self.router = get_model_router()
+        self.tool_executor = OrderedConcurrentToolExecutor()
+        self.hooks = (ToolTimingHook(), RoutingHook(self.router))
+        self.model_id = MODEL_ID
+        self.model = self.router.models["premier"]
+        self.diagrams_dir = os.path.abspath("diagrams")
+        self._prompt_template = SYSTEM_PROMPT_TEMPLATE.replace("{diagrams_dir}", self.diagrams_dir)
     
-    agent = Agent(
-        tools=tools,
-        model="us.amazon.nova-premier-v1:0",
-        system_prompt=system_prompt
+    def system_prompt(self, user_id: str) -> str:
+        """Render the shared system prompt for a user"""
+        return self._prompt_template.replace("{user_id}", user_id)
+
+# Singleton registry instance
+_registry_instance = None
+_registry_lock = threading.Lock()
+
+def get_agent_registry() -> AgentRegistry:
+    """Get or create the shared agent registry"""
+    global _registry_instance
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = AgentRegistry()
+                logger.info(f"Built agent registry with {len(_registry_instance.tools)} tools")
+    return _registry_instance
+
+def create_memory_agent(user_id: str = "default", messages: Optional[List[Dict[str, Any]]] = None) -> Agent:
+    """
+    Create a lightweight memory-enabled agent session for a user.
+    
+    Args:
+        user_id (str): User identifier for personalized memory
+        messages (list): Optional conversation history to resume
+        
+    Returns:
+        Agent: Memory-enabled Strands agent backed by the shared registry
+    """
+    registry = get_agent_registry()
+    
+    return Agent(
+        tools=list(registry.tools),
+        model=registry.model,
+        system_prompt=registry.system_prompt(user_id),
+        messages=messages,
+        conversation_manager=create_conversation_manager(user_id, memory=memory),
+        tool_executor=registry.tool_executor,
+        hooks=list(registry.hooks)
     )
+
+def _turn_usage(agent: Agent, result, decision, metrics_before, usage_before: Dict[str, int],
+                cycles_before: int) -> Dict[str, Any]:
+    """Token usage of one turn from the agent's accumulated metrics"""
+    # Metrics accumulate on the agent; diff them unless this turn got a fresh object
+    metrics = result.metrics if result is not None else agent.event_loop_metrics
+    if metrics is not metrics_before:
+        usage_before, cycles_before = {}, 0
+    usage = {
+        "input_tokens": metrics.accumulated_usage.get("inputTokens", 0) - usage_before.get("inputTokens", 0),
+        "output_tokens": metrics.accumulated_usage.get("outputTokens", 0) - usage_before.get("outputTokens", 0),
+        "total_tokens": metrics.accumulated_usage.get("totalTokens", 0) - usage_before.get("totalTokens", 0),
+        "llm_calls": metrics.cycle_count - cycles_before,
+        "model": decision.tier,
+    }
+    context_tokens = getattr(agent.conversation_manager, "last_context_tokens", None)
+    logger.info(f"Turn usage ({decision.tier}): {usage['input_tokens']} input tokens, {usage['output_tokens']} output tokens, "
+                f"{usage['llm_calls']} LLM calls, ~{context_tokens} history tokens")
+    return usage
+
+def run_agent_turn(agent: Agent, prompt: str, routing_text: Optional[str] = None):
+    """
+    Route and run one agent turn and report its token usage.
+    
+    Args:
+        agent (Agent): Agent to invoke
+        prompt (str): Full prompt for this turn
+        routing_text (str): Text to route on (defaults to the prompt), e.g. the
+            raw user message without injected memory context
+        
+    Returns:
+        tuple: (AgentResult, usage dict with tokens, LLM calls and routed model tier)
+    """
+    decision = get_agent_registry().router.apply(agent, routing_text or prompt)
+    
+    metrics_before = agent.event_loop_metrics
+    usage_before = dict(metrics_before.accumulated_usage)
+    cycles_before = metrics_before.cycle_count
+    
+    with timed(AGENT_TURN_SECONDS, model=decision.tier), \
+            span("agent.turn", model_tier=decision.tier, model_id=decision.model_id, route_reason=decision.reason):
+        result = agent(prompt)
+    
+    return result, _turn_usage(agent, result, decision, metrics_before, usage_before, cycles_before)
+
+def _trim_aborted_turn(agent: Agent):
+    """
+    Drop trailing messages an aborted turn left unanswered: the user prompt
+    or toolResult with no reply, or an assistant toolUse with no toolResult.
+    Bedrock rejects the next turn otherwise.
+    """
+    dropped = 0
+    while agent.messages:
+        last = agent.messages[-1]
+        if last.get("role") == "assistant" and not any("toolUse" in block for block in last.get("content", [])):
+            break
+        agent.messages.pop()
+        dropped += 1
+    if dropped:
+        logger.info(f"Trimmed {dropped} message(s) left by an aborted turn")
+
+async def stream_agent_turn(agent: Agent, prompt: str, routing_text: Optional[str] = None):
+    """
+    Streaming counterpart of run_agent_turn.
+    
+    Yields the agent's stream events (text "data", "current_tool_use",
+    "message", ...) as they happen, then {"result": AgentResult, "usage": dict}.
+    Routing and the agent run on worker threads, the agent with its own
+    event loop as in agent(prompt), so blocking work inside the turn
+    (classifier calls, history summarization, sync tools) never stalls the
+    caller's loop. Closing the generator early cancels the invocation, so a
+    client that disconnects stops paying for model calls, and waits for
+    the worker to stop so the agent is free for the next turn.
+    
+    Cancellation only takes effect at event boundaries: a tool call that is
+    already running (e.g. a diagram render) finishes first, and the caller
+    keeps holding the user's turn lock until it does. History left by an
+    aborted turn is trimmed so the next turn starts from a valid conversation.
+    """
+    decision = await asyncio.to_thread(get_agent_registry().router.apply, agent, routing_text or prompt)
+    
+    metrics_before = agent.event_loop_metrics
+    usage_before = dict(metrics_before.accumulated_usage)
+    cycles_before = metrics_before.cycle_count
+    
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
     
-    return agent
+    def publish(kind: str, value=None):
+        loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+    
+    async def drive():
+        events = agent.stream_async(prompt)
+        try:
+            async for event in events:
+                publish("event", event)
+                # agent.cancel() ends the turn at its next safe point; breaking out mid-tool
+                # is the fallback for agents without it
+                if stop.is_set() and not hasattr(agent, "cancel"):
+                    break
+        finally:
+            await events.aclose()
+    
+    def run():
+        try:
+            with timed(AGENT_TURN_SECONDS, model=decision.tier), \
+                    span("agent.turn", model_tier=decision.tier, model_id=decision.model_id,
+                         route_reason=decision.reason):
+                asyncio.run(drive())
+            publish("end")
+        except BaseException as e:
+            publish("error", e)
+        finally:
+            if stop.is_set():
+                _trim_aborted_turn(agent)
+    
+    worker = asyncio.ensure_future(asyncio.to_thread(run))
+    result = None
+    finished = False
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "error":
+                raise value
+            if kind == "end":
+                finished = True
+                break
+            if "result" in value:
+                result = value["result"]
+            else:
+                yield value
+    finally:
+        if not finished:
+            stop.set()
+            if hasattr(agent, "cancel"):
+                agent.cancel()
+            logger.info("Agent turn stopped before completion")
+        await asyncio.shield(worker)
+    
+    yield {"result": result, "usage": _turn_usage(agent, result, decision, metrics_before, usage_before, cycles_before)}
 
 def test_memory_agent():
     """Test the memory-enabled Strands agent."""
@@ -257,7 +492,7 @@ def test_memory_agent():
         print('='*60)
         
         try:
-            result = agent(query)
+            result, _ = run_agent_turn(agent, query)
             print(f"Response: {result}")
         except Exception as e:
             print(f"Error: {str(e)}")
@@ -301,7 +536,11 @@ def interactive_memory_chat():
                 continue
             
             print(f"\nAgent: ", end="")
-            result = agent(user_input)
+            reply = run_fast_path(agent, user_input) if FAST_PATH_ENABLED else None
+            if reply is not None:
+                print(reply)
+                continue
+            result, _ = run_agent_turn(agent, user_input)
             print(result)
             
         except KeyboardInterrupt:
@@ -5,9 +5,12 @@ Single source of truth for Mem0 memory instance
 """
 
 import os
+import functools
 from mem0 import Memory
 from dotenv import load_dotenv
 from custom_nova_llm import NovaMem0LLM
+from metrics import METRICS_ENABLED, MEMORY_SECONDS, timed
+from tracing import TRACING_ENABLED, span
 
 load_dotenv()
 
@@ -18,6 +21,31 @@ os.environ.setdefault('OPENAI_API_KEY', 'dummy-key')
 # Singleton memory instance
 _memory_instance = None
 
+def _instrument(obj, method: str, stage: str, operation=None):
+    """Time and trace obj.method; operation may be a fixed name or derived from the call"""
+    original = getattr(obj, method)
+    
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        op = operation(*args, **kwargs) if callable(operation) else operation
+        with timed(MEMORY_SECONDS, operation=op, stage=stage), span(f"mem0.{stage}", operation=op, method=method):
+            return original(*args, **kwargs)
+    
+    setattr(obj, method, wrapper)
+
+def _embed_operation(text, memory_action=None, *args, **kwargs):
+    return memory_action or "add"
+
+def instrument_memory(memory):
+    """Split Mem0 search/add time into embedding, vector store and LLM stages"""
+    _instrument(memory, "search", "total", "search")
+    _instrument(memory, "add", "total", "add")
+    _instrument(memory.embedding_model, "embed", "embedding", _embed_operation)
+    _instrument(memory.vector_store, "search", "vector_store", "search")
+    for method in ("insert", "update", "delete"):
+        _instrument(memory.vector_store, method, "vector_store", "write")
+    _instrument(memory.llm, "generate_response", "llm", "add")
+
 def get_memory():
     """Get or create the shared memory instance"""
     global _memory_instance
@@ -48,5 +76,7 @@ def get_memory():
         
         _memory_instance = Memory.from_config(config)
         _memory_instance.llm = custom_llm
+        if METRICS_ENABLED or TRACING_ENABLED:
+            instrument_memory(_memory_instance)
         
     return _memory_instance
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Keyword Index for Memory Search
+Local BM25 inverted index maintained next to the Qdrant collection,
+fused with vector results for hybrid retrieval
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path(os.getenv("MEMORY_INDEX_DIR", "memory_index"))
+COLLECTION_NAME = "ajay_memory_v2"
+
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+
+# BM25 / RRF parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+# get_all page size when bootstrapping, grown tenfold while a page comes back full
+MEMORY_PAGE_SIZE = 1000
+MEMORY_SCAN_MAX = 100000
+
+# Keeps identifiers such as "my-app.logs" or "s3:bucket" together as one token
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+_PART_RE = re.compile(r"[-_.:/]")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "was", "what",
+    "with", "user", "users",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase index terms, keeping compound identifiers and their parts"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token not in _STOPWORDS:
+            terms.append(token)
+        if _PART_RE.search(token):
+            terms.extend(p for p in _PART_RE.split(token) if p and p not in _STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over one user's memories"""
+
+    def __init__(self):
+        self.docs: Dict[str, str] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc_id: str, text: str):
+        """Add or replace a document"""
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        self.docs[doc_id] = text
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.total_length += self.doc_lengths[doc_id]
+        for term, freq in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = freq
+
+    def remove(self, doc_id: str):
+        """Remove a document if present"""
+        text = self.docs.pop(doc_id, None)
+        if text is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Return (doc_id, score) pairs ranked by BM25"""
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, freq in docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+class KeywordIndexStore:
+    """Per-user BM25 indexes persisted as JSON next to the vector collection"""
+
+    def __init__(self, memory, index_dir: Path = INDEX_DIR, collection_name: str = COLLECTION_NAME):
+        self.memory = memory
+        self.index_dir = Path(index_dir) / collection_name
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._indexes: Dict[str, BM25Index] = {}
+        self._lock = threading.RLock()
+
+    def _path(self, user_id: str) -> Path:
+        safe_user = re.sub(r"[^\w.@-]", "_", user_id)
+        return self.index_dir / f"{safe_user}.json"
+
+    def get(self, user_id: str) -> BM25Index:
+        """Get a user's index, loading it from disk or bootstrapping it from Mem0"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                return index
+
+            index = BM25Index()
+            path = self._path(user_id)
+            if path.exists():
+                try:
+                    for doc_id, text in json.loads(path.read_text(encoding="utf-8")).items():
+                        index.add(doc_id, text)
+                except Exception as e:
+                    logger.warning(f"Rebuilding corrupt keyword index for {user_id}: {e}")
+                    index = self._bootstrap(user_id)
+            else:
+                index = self._bootstrap(user_id)
+
+            self._indexes[user_id] = index
+            return index
+
+    def _bootstrap(self, user_id: str) -> BM25Index:
+        """Build an index from the user's stored memories (no embedding calls)"""
+        index = BM25Index()
+        try:
+            limit = MEMORY_PAGE_SIZE
+            while True:
+                result = self.memory.get_all(user_id=user_id, limit=limit)
+                memories = (result.get('results', []) if isinstance(result, dict) else result) or []
+                if len(memories) < limit:
+                    break
+                if limit >= MEMORY_SCAN_MAX:
+                    logger.warning(f"Keyword index for {user_id} covers only the first {limit} memories")
+                    break
+                limit *= 10
+            for mem in memories:
+                index.add(str(mem['id']), mem['memory'])
+            self._save(user_id, index)
+            logger.info(f"Bootstrapped keyword index for {user_id} with {len(index)} memories")
+        except Exception as e:
+            logger.warning(f"Could not bootstrap keyword index for {user_id}: {e}")
+        return index
+
+    def _save(self, user_id: str, index: BM25Index):
+        path = self._path(user_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(index.docs), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def apply_add_result(self, user_id: str, result: Any):
+        """Mirror the events returned by memory.add() into the keyword index"""
+        events = result.get('results', []) if isinstance(result, dict) else result
+        if not events:
+            return
+        with self._lock:
+            index = self.get(user_id)
+            for event in events:
+                doc_id = str(event.get('id', ''))
+                if not doc_id:
+                    continue
+                if event.get('event') == 'DELETE':
+                    index.remove(doc_id)
+                elif event.get('memory'):
+                    index.add(doc_id, event['memory'])
+            self._save(user_id, index)
+
+    def remove(self, user_id: str, doc_id: str):
+        """Remove a single memory from the index"""
+        with self._lock:
+            index = self.get(user_id)
+            index.remove(str(doc_id))
+            self._save(user_id, index)
+
+    def drop(self, user_id: str):
+        """Forget a user's index entirely"""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+            self._path(user_id).unlink(missing_ok=True)
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Keyword search returning Mem0-shaped result dicts"""
+        with self._lock:
+            index = self.get(user_id)
+            return [
+                {"id": doc_id, "memory": index.docs[doc_id], "score": score}
+                for doc_id, score in index.search(query, limit)
+            ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], limit: int = 5, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Fuse ranked result lists by reciprocal rank, keyed on memory id"""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, mem in enumerate(results, 1):
+            doc_id = str(mem['id'])
+            entry = fused.setdefault(doc_id, {**mem, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+    ranked = sorted(fused.values(), key=lambda mem: mem["score"], reverse=True)
+    return ranked[:limit]
+
+
+# Singleton keyword index store
+_store_instance = None
+_store_lock = threading.Lock()
+
+def get_keyword_index(memory=None) -> KeywordIndexStore:
+    """Get or create the shared keyword index store"""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                if memory is None:
+                    from memory_config import get_memory
+                    memory = get_memory()
+                _store_instance = KeywordIndexStore(memory)
+    return _store_instance
+
+
+def search_memories(memory, query: str, user_id: str, limit: int = 5, mode: str = "vector") -> List[Dict[str, Any]]:
+    """
+    Search memories in vector, keyword or hybrid mode
+
+    Keyword mode never calls the embedder. Hybrid mode over-fetches from
+    both retrievers and fuses them with reciprocal-rank fusion.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+
+    if mode == "keyword":
+        return get_keyword_index(memory).search(query, user_id, limit)
+
+    fetch = limit * 2 if mode == "hybrid" else limit
+    result = memory.search(query, user_id=user_id, limit=fetch)
+    vector_results = result.get('results', []) if isinstance(result, dict) else result
+    if mode == "vector":
+        return vector_results or []
+
+    keyword_results = get_keyword_index(memory).search(query, user_id, fetch)
+    return reciprocal_rank_fusion([vector_results or [], keyword_results], limit)
+
+
+def format_memory_context(memories: List[Dict[str, Any]], max_chars: int) -> str:
+    """Render memories as a bullet list, stopping before max_chars is exceeded"""
+    lines = []
+    used = 0
+    for mem in memories:
+        line = f"- {mem['memory']}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
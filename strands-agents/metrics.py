@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics
+Per-stage latency histograms and gauges; every metric is a no-op when
+METRICS_ENABLED=false or prometheus_client is not installed
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true" and prometheus_client is not None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+class _NoopMetric:
+    """Stands in for any Prometheus metric when metrics are disabled"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def set_function(self, fn):
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+def _histogram(name: str, documentation: str, labels=(), buckets=LATENCY_BUCKETS):
+    if not METRICS_ENABLED:
+        return _NOOP
+    return prometheus_client.Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _gauge(name: str, documentation: str, labels=()):
+    if not METRICS_ENABLED:
+        return _NOOP
+    return prometheus_client.Gauge(name, documentation, labels)
+
+
+def _counter(name: str, documentation: str, labels=()):
+    if not METRICS_ENABLED:
+        return _NOOP
+    return prometheus_client.Counter(name, documentation, labels)
+
+
+REQUEST_SECONDS = _histogram("chat_request_seconds", "End-to-end chat request time", ["endpoint"])
+AGENT_TURN_SECONDS = _histogram("agent_turn_seconds", "Agent turn time", ["model"])
+LLM_CALL_SECONDS = _histogram("llm_call_seconds", "Bedrock model call time", ["model_id"])
+LLM_INPUT_TOKENS = _histogram("llm_input_tokens", "Input tokens per model call", ["model_id"], TOKEN_BUCKETS)
+LLM_OUTPUT_TOKENS = _histogram("llm_output_tokens", "Output tokens per model call", ["model_id"], TOKEN_BUCKETS)
+TOOL_SECONDS = _histogram("tool_call_seconds", "Tool invocation time", ["tool", "status"])
+MEMORY_SECONDS = _histogram("memory_operation_seconds", "Mem0 operation time by stage",
+                            ["operation", "stage"])
+DIAGRAM_RENDER_SECONDS = _histogram("diagram_render_seconds", "Diagram render time", ["status"])
+DIAGRAM_WORKER_SECONDS = _histogram("diagram_worker_seconds", "Render worker time by phase (preload, setup, exec)",
+                                    ["phase"])
+
+CACHED_AGENTS = _gauge("cached_agents", "Per-user agents held in memory")
+MCP_SUBPROCESSES = _gauge("mcp_subprocesses", "Running MCP server subprocesses")
+QUEUE_DEPTH = _gauge("queue_depth", "Pending work items", ["queue"])
+
+COALESCED_REQUESTS = _counter("coalesced_requests", "Chat requests attached to an in-flight turn")
+DIAGRAM_CACHE_REQUESTS = _counter("diagram_cache_requests", "Diagram render cache lookups", ["result"])
+DIAGRAM_RECLAIMED_BYTES = _counter("diagram_reclaimed_bytes", "Bytes freed by the diagram retention sweeper",
+                                   ["reason"])
+
+
+@contextmanager
+def timed(metric, **labels):
+    """Observe the duration of a block on a histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (metric.labels(**labels) if labels else metric).observe(time.perf_counter() - start)
+
+
+def render_latest():
+    """Return (body, content type) for the /metrics endpoint"""
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
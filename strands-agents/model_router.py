@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Model Router
+Sends each turn to the smallest Nova model that can handle it
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, AsyncGenerator, Dict, NamedTuple, Optional
+from strands.hooks import (AfterInvocationEvent, AfterModelCallEvent, BeforeInvocationEvent,
+                           BeforeModelCallEvent, HookProvider, HookRegistry)
+from strands.models import BedrockModel
+from custom_nova_llm import NovaMem0LLM
+from metrics import LLM_CALL_SECONDS, LLM_INPUT_TOKENS, LLM_OUTPUT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+MODEL_TIERS = {
+    "micro": os.getenv("ROUTER_MICRO_MODEL", "us.amazon.nova-micro-v1:0"),
+    "lite": os.getenv("ROUTER_LITE_MODEL", "us.amazon.nova-lite-v1:0"),
+    "premier": os.getenv("ROUTER_PREMIER_MODEL", "us.amazon.nova-premier-v1:0"),
+}
+TIER_ORDER = ("micro", "lite", "premier")
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+ROUTER_USE_CLASSIFIER = os.getenv("ROUTER_USE_CLASSIFIER", "false").lower() == "true"
+ROUTER_DEFAULT_TIER = os.getenv("ROUTER_DEFAULT_TIER", "lite")
+# Model calls within one turn before a smaller model is swapped for Premier
+ROUTER_ESCALATE_AFTER = int(os.getenv("ROUTER_ESCALATE_AFTER", "3"))
+
+CLASSIFIER_PROMPT = """
+Classify how capable a model must be to answer the user's message with tools.
+micro: single trivial lookup (time, arithmetic, letter counts, greetings, thanks).
+lite: one or two simple tool calls or memory lookups (account info, bucket list, "what's my name").
+premier: diagrams, architecture design, multi-step reasoning, several dependent tool calls, long or ambiguous requests.
+Reply with exactly one word: micro, lite or premier.
+"""
+
+_DIAGRAM_RE = re.compile(r"\b(diagram|architecture|draw|visuali[sz]e|design)\b", re.I)
+_MULTI_STEP_RE = re.compile(r"\b(and then|after that|step by step|compare|plan|migrate|explain why|trade-?offs?)\b", re.I)
+# Edits to the previous answer ("ok now add DynamoDB to it") carry on a diagram or build
+_FOLLOW_UP_RE = re.compile(
+    r"\b(add|connect|remove|delete|change|move|rename|replace|swap)\b.*\b(it|that|this|previous|the diagram)\b",
+    re.I)
+# Requests to produce code or infrastructure
+_BUILD_RE = re.compile(
+    r"\b(write|create|build|generate|set up|deploy)\b.{0,40}"
+    r"\b(module|script|template|function|lambdas?|pipeline|stack|terraform|cloudformation|cdk|code)\b",
+    re.I)
+_TRIVIAL_RE = re.compile(
+    # Greetings and sign-offs only when they are the whole message, not a lead-in to a request
+    r"^\s*(hi|hello|hey|thanks|thank you|ok|okay|bye)(?:[\s!.,]+(?:there|so much|again|that'?s all|bye))*[\s!.,]*$"
+    r"|\b(what(?:'s| is) the (?:current )?time|what time is it|current time|today'?s date)\b"
+    r"|\b(calculate|compute|what(?:'s| is))\s+[-\d(][\d\s.+\-*/^()%]*\??\s*$"
+    r"|\bcount (?:the )?(?:letter|number of)\b",
+    re.I)
+_LITE_RE = re.compile(r"\b(my name|remember|what do i|my (?:aws )?account|buckets?|s3|preferences?|who am i)\b", re.I)
+
+
+class InstrumentedBedrockModel(BedrockModel):
+    """BedrockModel that records per-call latency and token usage"""
+
+    async def stream(self, *args, **kwargs) -> AsyncGenerator[Any, None]:
+        model_id = self.config.get("model_id", "unknown")
+        start = time.perf_counter()
+        try:
+            async for event in super().stream(*args, **kwargs):
+                usage = event.get("metadata", {}).get("usage") if isinstance(event, dict) else None
+                if usage:
+                    LLM_INPUT_TOKENS.labels(model_id=model_id).observe(usage.get("inputTokens", 0))
+                    LLM_OUTPUT_TOKENS.labels(model_id=model_id).observe(usage.get("outputTokens", 0))
+                yield event
+        finally:
+            LLM_CALL_SECONDS.labels(model_id=model_id).observe(time.perf_counter() - start)
+
+
+class RoutingDecision(NamedTuple):
+    tier: str
+    model_id: str
+    reason: str
+
+
+def classify_heuristic(message: str) -> Optional[RoutingDecision]:
+    """Cheap rule-based routing; returns None when unsure"""
+    def decide(tier: str, reason: str) -> RoutingDecision:
+        return RoutingDecision(tier, MODEL_TIERS[tier], reason)
+
+    if _DIAGRAM_RE.search(message):
+        return decide("premier", "diagram")
+    if len(message) > 600 or _MULTI_STEP_RE.search(message) or message.count("?") > 1:
+        return decide("premier", "multi-step")
+    if _FOLLOW_UP_RE.search(message) and not _LITE_RE.search(message):
+        return decide("premier", "follow-up")
+    if _BUILD_RE.search(message):
+        return decide("premier", "build")
+    if _TRIVIAL_RE.search(message) and len(message) < 120:
+        return decide("micro", "trivial")
+    if _LITE_RE.search(message) and len(message) < 300:
+        return decide("lite", "simple-lookup")
+    return None
+
+
+class ModelRouter:
+    """Route turns across Nova tiers and record per-model latency"""
+
+    def __init__(self, use_classifier: bool = ROUTER_USE_CLASSIFIER, default_tier: str = ROUTER_DEFAULT_TIER):
+        self.models: Dict[str, BedrockModel] = {tier: InstrumentedBedrockModel(model_id=model_id)
+                                                for tier, model_id in MODEL_TIERS.items()}
+        self.use_classifier = use_classifier
+        self.default_tier = default_tier
+        self._classifier = None
+        self._latency: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def classify_with_llm(self, message: str) -> Optional[RoutingDecision]:
+        """Ask Nova Micro for a tier; returns None on failure or an unexpected answer"""
+        try:
+            if self._classifier is None:
+                self._classifier = NovaMem0LLM({"model": "amazon.nova-micro-v1:0", "temperature": 0.0, "max_tokens": 5})
+            answer = self._classifier.generate_response([
+                {"role": "system", "content": CLASSIFIER_PROMPT},
+                {"role": "user", "content": message[:2000]}
+            ]).strip().lower()
+            tier = next((t for t in TIER_ORDER if t in answer), None)
+            return RoutingDecision(tier, MODEL_TIERS[tier], "classifier") if tier else None
+        except Exception as e:
+            logger.warning(f"Routing classifier failed: {e}")
+            return None
+
+    def route(self, message: str) -> RoutingDecision:
+        """Pick a tier: heuristics first, then the optional classifier, then the default"""
+        decision = classify_heuristic(message)
+        if decision is None and self.use_classifier:
+            decision = self.classify_with_llm(message)
+        if decision is None:
+            decision = RoutingDecision(self.default_tier, MODEL_TIERS[self.default_tier], "default")
+        return decision
+
+    def apply(self, agent, message: str) -> RoutingDecision:
+        """Point the agent at the routed model for its next turn"""
+        if not MODEL_ROUTING:
+            decision = RoutingDecision("premier", MODEL_TIERS["premier"], "routing-disabled")
+        else:
+            decision = self.route(message)
+        agent.model = self.models[decision.tier]
+        logger.info(f"Routed turn to {decision.tier} ({decision.model_id}): {decision.reason}")
+        return decision
+
+    def record_latency(self, model_id: str, seconds: float):
+        with self._lock:
+            stats = self._latency.setdefault(model_id, {"calls": 0, "total_s": 0.0, "max_s": 0.0})
+            stats["calls"] += 1
+            stats["total_s"] += seconds
+            stats["max_s"] = max(stats["max_s"], seconds)
+
+    def latency_snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {model_id: {**stats, "mean_s": stats["total_s"] / stats["calls"]}
+                    for model_id, stats in self._latency.items()}
+
+
+class RoutingHook(HookProvider):
+    """Time model calls per model and escalate long tool loops to Premier"""
+
+    def __init__(self, router: ModelRouter):
+        self.router = router
+        self._calls: Dict[int, int] = {}
+        self._starts: Dict[int, float] = {}
+
+    def register_hooks(self, registry: HookRegistry, **kwargs) -> None:
+        registry.add_callback(BeforeInvocationEvent, self._before_invocation)
+        registry.add_callback(BeforeModelCallEvent, self._before_model)
+        registry.add_callback(AfterModelCallEvent, self._after_model)
+        registry.add_callback(AfterInvocationEvent, self._after_invocation)
+
+    def _before_invocation(self, event: BeforeInvocationEvent) -> None:
+        self._calls[id(event.agent)] = 0
+
+    def _after_invocation(self, event: AfterInvocationEvent) -> None:
+        # Keyed by id(agent), which a later agent can reuse
+        self._calls.pop(id(event.agent), None)
+        self._starts.pop(id(event.agent), None)
+
+    def _before_model(self, event: BeforeModelCallEvent) -> None:
+        key = id(event.agent)
+        self._calls[key] = self._calls.get(key, 0) + 1
+        premier = self.router.models["premier"]
+        if MODEL_ROUTING and self._calls[key] > ROUTER_ESCALATE_AFTER and event.agent.model is not premier:
+            logger.info(f"Escalating to premier after {self._calls[key] - 1} model calls in one turn")
+            event.agent.model = premier
+        self._starts[key] = time.perf_counter()
+
+    def _after_model(self, event: AfterModelCallEvent) -> None:
+        start = self._starts.pop(id(event.agent), None)
+        if start is None:
+            return
+        model_id = event.agent.model.config.get("model_id", "unknown")
+        seconds = time.perf_counter() - start
+        self.router.record_latency(model_id, seconds)
+        logger.info(f"Model call to {model_id} took {seconds:.2f}s")
+
+
+# Singleton router instance
+_router_instance = None
+_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """Get or create the shared model router"""
+    global _router_instance
+    if _router_instance is None:
+        with _router_lock:
+            if _router_instance is None:
+                _router_instance = ModelRouter()
+    return _router_instance
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Request Coalescer
+Attaches duplicate chat submissions to the computation already in flight
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Seconds a finished result stays attachable (catches reruns and double clicks)
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "5"))
+
+
+def request_key(user_id: str, message: str) -> Tuple[str, str]:
+    """Key a request by user and message hash"""
+    return user_id, hashlib.sha256(message.strip().encode("utf-8")).hexdigest()
+
+
+class _SharedStream:
+    """Events of one in-flight streamed computation, replayed to every subscriber"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def pump(self, factory: Callable[[], AsyncIterator[Any]]):
+        try:
+            async with aclosing(factory()) as events:
+                async for event in events:
+                    self.events.append(event)
+                    self.notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self.notify()
+
+    def done(self) -> bool:
+        return self.task.done()
+
+
+class RequestCoalescer:
+    """
+    Share one in-flight computation among identical requests.
+
+    Must be used from a single event loop (the API's). The shared task is
+    shielded so a caller disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self, window_seconds: float = COALESCE_WINDOW):
+        self.window_seconds = window_seconds
+        self._entries: Dict[Tuple[str, str], Tuple[asyncio.Future, float]] = {}
+        self._streams: Dict[Tuple[str, str], Tuple[_SharedStream, float]] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for entries in (self._entries, self._streams):
+            expired = [key for key, (task, finished) in entries.items()
+                       if task.done() and now - finished > self.window_seconds]
+            for key in expired:
+                del entries[key]
+
+    async def run(self, key: Tuple[str, str], factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the shared result for key, starting factory() if nothing is attachable"""
+        self._evict_expired()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc()
+            logger.info(f"Coalesced duplicate request for user {key[0]}")
+            return await asyncio.shield(entry[0])
+
+        task = asyncio.ensure_future(factory())
+        self._entries[key] = (task, float("inf"))
+        self.executed += 1
+
+        def _finished(done: asyncio.Future):
+            # Failed turns are not reused; successful ones stay attachable for the window
+            if done.cancelled() or done.exception() is not None:
+                self._entries.pop(key, None)
+            elif key in self._entries:
+                self._entries[key] = (done, time.monotonic())
+
+        task.add_done_callback(_finished)
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Tuple[str, str], factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Iterate the shared event stream for key, starting factory() if
+        nothing is attachable. Late subscribers get the events so far, then
+        the live ones. The computation is cancelled only once every
+        subscriber has left before it finished.
+        """
+        self._evict_expired()
+        entry = self._streams.get(key)
+        if entry is not None:
+            shared = entry[0]
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc()
+            logger.info(f"Coalesced duplicate streamed request for user {key[0]}")
+        else:
+            shared = _SharedStream()
+            shared.task = asyncio.ensure_future(shared.pump(factory))
+            self._streams[key] = (shared, float("inf"))
+            self.executed += 1
+
+            def _finished(done: asyncio.Future):
+                # Failed or abandoned streams are not reused; finished ones stay attachable for the window
+                if shared.error is not None or done.cancelled():
+                    if self._streams.get(key, (None,))[0] is shared:
+                        del self._streams[key]
+                elif key in self._streams:
+                    self._streams[key] = (shared, time.monotonic())
+
+            shared.task.add_done_callback(_finished)
+
+        shared.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(shared.events):
+                    yield shared.events[position]
+                    position += 1
+                if shared.finished:
+                    break
+                await shared.changed.wait()
+            if shared.error is not None:
+                raise shared.error
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.finished:
+                shared.task.cancel()
+
+    def in_flight(self) -> int:
+        return sum(1 for entries in (self._entries, self._streams)
+                   for task, _ in entries.values() if not task.done())
+
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": self.in_flight()}
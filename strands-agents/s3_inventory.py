@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+S3 Inventory Tool
+Concurrent, paginated bucket metadata with compact, token-budgeted summaries
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from botocore.exceptions import ClientError
+from strands import tool
+from aws_clients import cached_result, get_account_id, get_client
+from tool_runtime import run_io
+
+logger = logging.getLogger(__name__)
+
+S3_INVENTORY_WORKERS = int(os.getenv("S3_INVENTORY_WORKERS", "16"))
+S3_INVENTORY_MAX_CHARS = int(os.getenv("S3_INVENTORY_MAX_CHARS", "2000"))
+S3_LIST_PAGE_SIZE = 1000
+
+_executor = ThreadPoolExecutor(max_workers=S3_INVENTORY_WORKERS, thread_name_prefix="s3-inventory")
+
+
+def inventory_queue_depth() -> int:
+    """Per-bucket lookups waiting for a worker"""
+    return _executor._work_queue.qsize()
+
+
+def _bucket_region(name: str) -> str:
+    """Resolve a bucket's region with GetBucketLocation"""
+    location = get_client('s3').get_bucket_location(Bucket=name).get('LocationConstraint')
+    if not location:
+        return 'us-east-1'
+    return 'eu-west-1' if location == 'EU' else location
+
+
+def _list_buckets() -> List[Dict[str, Any]]:
+    """List every bucket with region and creation date"""
+    s3 = get_client('s3')
+    buckets = []
+    if s3.can_paginate('list_buckets'):
+        # Paginated requests also return BucketRegion, saving a call per bucket
+        paginator = s3.get_paginator('list_buckets')
+        for page in paginator.paginate(PaginationConfig={'PageSize': S3_LIST_PAGE_SIZE}):
+            buckets.extend(page.get('Buckets', []))
+    else:
+        buckets = s3.list_buckets().get('Buckets', [])
+
+    missing = [b['Name'] for b in buckets if not b.get('BucketRegion')]
+    regions = dict(zip(missing, _executor.map(_safe(_bucket_region, 'unknown'), missing)))
+
+    return [
+        {
+            'name': b['Name'],
+            'region': b.get('BucketRegion') or regions.get(b['Name'], 'unknown'),
+            'created': b['CreationDate'].strftime('%Y-%m-%d') if b.get('CreationDate') else '',
+        }
+        for b in buckets
+    ]
+
+
+def _bucket_tags(name: str) -> Dict[str, str]:
+    try:
+        tag_set = get_client('s3').get_bucket_tagging(Bucket=name).get('TagSet', [])
+        return {t['Key']: t['Value'] for t in tag_set}
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchTagSet':
+            return {}
+        raise
+
+
+def _bucket_size(name: str, region: str) -> Optional[int]:
+    """Latest daily BucketSizeBytes (standard storage) from CloudWatch"""
+    cloudwatch = get_client('cloudwatch', region_name=None if region == 'unknown' else region)
+    now = datetime.now(timezone.utc)
+    response = cloudwatch.get_metric_statistics(
+        Namespace='AWS/S3',
+        MetricName='BucketSizeBytes',
+        Dimensions=[{'Name': 'BucketName', 'Value': name},
+                    {'Name': 'StorageType', 'Value': 'StandardStorage'}],
+        StartTime=now - timedelta(days=3),
+        EndTime=now,
+        Period=86400,
+        Statistics=['Average'],
+    )
+    points = sorted(response.get('Datapoints', []), key=lambda p: p['Timestamp'])
+    return int(points[-1]['Average']) if points else None
+
+
+def _safe(fn, default):
+    """Wrap a per-bucket lookup so one failure doesn't fail the inventory"""
+    def wrapper(*args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            logger.debug(f"{fn.__name__}{args} failed: {e}")
+            return default
+    return wrapper
+
+
+def _enrich(bucket: Dict[str, Any], include_tags: bool, include_size: bool, refresh: bool) -> Dict[str, Any]:
+    """Add tags/size to a bucket record, cached per account and bucket"""
+    enriched = dict(bucket)
+    if include_tags:
+        enriched['tags'] = cached_result(f"s3_tags:{bucket['name']}",
+                                         lambda: _safe(_bucket_tags, None)(bucket['name']), refresh=refresh)
+    if include_size:
+        enriched['size'] = cached_result(f"s3_size:{bucket['name']}",
+                                         lambda: _safe(_bucket_size, None)(bucket['name'], bucket['region']),
+                                         refresh=refresh)
+    return enriched
+
+
+def _format_size(size: Optional[int]) -> str:
+    if size is None:
+        return 'size n/a'
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _format_bucket(bucket: Dict[str, Any]) -> str:
+    parts = [bucket['name'], bucket['region'], bucket['created']]
+    if 'size' in bucket:
+        parts.append(_format_size(bucket['size']))
+    if bucket.get('tags'):
+        parts.append(','.join(f"{k}={v}" for k, v in bucket['tags'].items()))
+    return ' | '.join(p for p in parts if p)
+
+
+def get_inventory(
+    prefix: str = "",
+    region: str = "",
+    include_tags: bool = False,
+    include_size: bool = False,
+    page: int = 1,
+    page_size: int = 25,
+    refresh: bool = False,
+    max_chars: int = S3_INVENTORY_MAX_CHARS
+) -> str:
+    """Build the compact inventory summary returned by the s3_inventory tool"""
+    buckets = cached_result("s3_inventory", _list_buckets, refresh=refresh)
+    if not buckets:
+        return "No S3 buckets found in this account."
+
+    matches = [b for b in buckets
+               if b['name'].startswith(prefix) and (not region or b['region'] == region)]
+    page_size = max(1, min(page_size, 100))
+    pages = max(1, -(-len(matches) // page_size))
+    page = min(max(1, page), pages)
+    selected = matches[(page - 1) * page_size:page * page_size]
+
+    if include_tags or include_size:
+        selected = list(_executor.map(lambda b: _enrich(b, include_tags, include_size, refresh), selected))
+
+    filters = ', '.join(f for f in (f"prefix '{prefix}'" if prefix else '',
+                                    f"region {region}" if region else '') if f)
+    by_region = Counter(b['region'] for b in matches)
+    lines = [
+        f"S3 buckets in account {get_account_id()}: {len(buckets)} total"
+        + (f", {len(matches)} matching {filters}" if filters else "")
+        + f" (page {page}/{pages})",
+        "By region: " + ', '.join(f"{r}={n}" for r, n in by_region.most_common()),
+        "name | region | created" + (" | size" if include_size else "") + (" | tags" if include_tags else ""),
+    ]
+
+    used = sum(len(line) + 1 for line in lines)
+    for i, bucket in enumerate(selected):
+        line = _format_bucket(bucket)
+        if used + len(line) > max_chars:
+            lines.append(f"... {len(selected) - i} more on this page omitted; narrow with prefix/region or a smaller page_size")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    if page < pages:
+        lines.append(f"Next: page={page + 1}")
+    return '\n'.join(lines)
+
+
+@tool
+async def s3_inventory(
+    prefix: str = "",
+    region: str = "",
+    include_tags: bool = False,
+    include_size: bool = False,
+    page: int = 1,
+    page_size: int = 25,
+    refresh: bool = False
+) -> str:
+    """
+    List S3 buckets in the current AWS account with region and creation date.
+
+    Args:
+        prefix (str): Only include buckets whose name starts with this prefix
+        region (str): Only include buckets in this region (e.g. "us-east-1")
+        include_tags (bool): Also fetch bucket tags
+        include_size (bool): Also fetch bucket size from CloudWatch
+        page (int): Page number, starting at 1
+        page_size (int): Buckets per page (max 100)
+        refresh (bool): Bypass the cache and query AWS again
+
+    Returns:
+        str: Compact bucket summary with per-region counts
+    """
+    try:
+        return await run_io("s3_inventory", get_inventory, prefix, region,
+                            include_tags, include_size, page, page_size, refresh)
+    except Exception as e:
+        return f"Error listing S3 buckets: {str(e)}"
+
+
+if __name__ == "__main__":
+    # Compare against the previous single-string listing
+    start = time.perf_counter()
+    names = [b['Name'] for b in get_client('s3').list_buckets().get('Buckets', [])]
+    legacy = f"S3 Buckets ({len(names)}): {', '.join(names)}"
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = get_inventory()
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_inventory()
+    warm_time = time.perf_counter() - start
+
+    print(summary)
+    print(f"\nlegacy:    {legacy_time * 1000:8.1f} ms, ~{len(legacy) // 4} tokens")
+    print(f"inventory: {cold_time * 1000:8.1f} ms cold, {warm_time * 1000:.3f} ms cached, ~{len(summary) // 4} tokens")
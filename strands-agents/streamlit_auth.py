@@ -3,11 +3,13 @@
 
 import streamlit as st
 import requests
+import json
 import os
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from streamlit_oauth import OAuth2Component
 from dotenv import load_dotenv
+from http_session import create_http_session
 
 load_dotenv()
 
@@ -101,38 +103,79 @@ def init_session():
     if "token_checked" not in st.session_state:
         st.session_state.token_checked = False
 
+@st.cache_resource
+def get_http_session():
+    """Keep-alive session shared by every Streamlit session in this process"""
+    return create_http_session()
+
 def call_api(endpoint: str, method: str = "GET", data: Optional[Dict] = None):
     try:
         url = f"{API_BASE_URL}{endpoint}"
+        session = get_http_session()
         if method == "POST":
-            response = requests.post(url, json=data, timeout=300)
+            response = session.post(url, json=data, timeout=300)
         elif method == "DELETE":
-            response = requests.delete(url, timeout=300)
+            response = session.delete(url, timeout=300)
         else:
-            response = requests.get(url, timeout=300)
+            response = session.get(url, timeout=300)
         response.raise_for_status()
         return response.json()
     except Exception as e:
         st.error(f"Error: {str(e)}")
         return {"success": False}
 
-def get_response(prompt: str, user_id: str):
-    """Get API response with proper error handling"""
+def stream_response(prompt: str, user_id: str, progress, diagram_area, diagrams: List[Dict[str, str]]):
+    """
+    Yield reply text from /chat/stream for st.write_stream. Tool progress
+    goes to the progress status, and each diagram is shown in diagram_area
+    (and appended to diagrams) as soon as it arrives. Closing the generator
+    closes the connection, which cancels the turn on the server.
+    """
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/chat",
+        with get_http_session().post(
+            f"{API_BASE_URL}/chat/stream",
             json={"messages": [{"role": "user", "content": prompt}], "user_id": user_id},
-            timeout=300
-        )
-        response.raise_for_status()
-        result = response.json()
-        return result.get("message", "No response"), result.get("diagram_path")
+            stream=True,
+            timeout=(10, 300)  # connect, and longest gap between events
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "text":
+                    yield event["data"]
+                elif event["type"] == "tool_start":
+                    progress.update(label=f"🔧 Running {event['tool']}...")
+                    progress.write(f"🔧 `{event['tool']}` started")
+                elif event["type"] == "tool_end":
+                    icon = "✅" if event.get("status") == "success" else "⚠️"
+                    progress.write(f"{icon} `{event['tool']}` finished in {event['seconds']}s")
+                    progress.update(label="🤔 Thinking...")
+                elif event["type"] == "diagram" or (event["type"] == "done" and event.get("diagram_variants")):
+                    variants = event.get("variants") or event["diagram_variants"]
+                    if variants not in diagrams:
+                        diagrams.append(variants)
+                        with diagram_area:
+                            show_diagram(variants, full_size=True)
+                elif event["type"] == "error":
+                    yield f"\n\n⚠️ Error: {event['detail']}"
+        progress.update(label="Done", state="complete")
     except requests.exceptions.Timeout:
-        return "⚠️ Request timed out. The agent is taking longer than expected. Please try again.", None
+        progress.update(label="Timed out", state="error")
+        yield "⚠️ Request timed out. The agent is taking longer than expected. Please try again."
     except requests.exceptions.RequestException as e:
-        return f"⚠️ Connection error: {str(e)}", None
-    except Exception as e:
-        return f"⚠️ Error: {str(e)}", None
+        progress.update(label="Connection error", state="error")
+        yield f"⚠️ Connection error: {str(e)}"
+
+def show_diagram(variants: Dict[str, str], full_size: bool = False):
+    """Show a diagram; history shows the thumbnail with links to the full-size variants"""
+    shown = "png" if full_size or "thumbnail" not in variants else "thumbnail"
+    st.image(f"{API_BASE_URL}{variants[shown]}", caption="Generated Diagram")
+    links = [f"[{label}]({API_BASE_URL}{variants[name]})" for name, label in (("png", "Full size"), ("svg", "SVG"))
+             if name in variants and name != shown]
+    if links:
+        st.markdown(" · ".join(links))
 
 def login_page():
     st.markdown('<div class="login-container">', unsafe_allow_html=True)
@@ -272,8 +315,10 @@ def main_app():
     for msg in st.session_state.messages:
         with st.chat_message(msg["role"], avatar="👤" if msg["role"] == "user" else "🤖"):
             st.markdown(msg["content"])
-            if "diagram" in msg and msg["diagram"]:
-                st.image(f"{API_BASE_URL}{msg['diagram']}", caption="Generated Diagram")
+            if msg.get("diagram"):
+                # Older sessions stored a bare PNG path
+                variants = msg["diagram"] if isinstance(msg["diagram"], dict) else {"png": msg["diagram"]}
+                show_diagram(variants)
     
     if prompt := st.chat_input("💬 Ask me anything... I'll remember our conversation!"):
         st.session_state.messages.append({"role": "user", "content": prompt})
@@ -281,13 +326,18 @@ def main_app():
             st.markdown(prompt)
         
         with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("🤔 Thinking..."):
-                response, diagram_path = get_response(prompt, st.session_state.user_id)
-            st.markdown(response)
+            progress = st.status("🤔 Thinking...", expanded=False)
+            diagram_area = st.container()
+            diagrams = []
+            events = stream_response(prompt, st.session_state.user_id, progress, diagram_area, diagrams)
+            try:
+                response = st.write_stream(events)
+            finally:
+                # Navigating away stops this script; drop the connection so the server cancels the turn
+                events.close()
             
-            if diagram_path:
-                st.image(f"{API_BASE_URL}{diagram_path}", caption="Generated Diagram")
-                st.session_state.messages.append({"role": "assistant", "content": response, "diagram": diagram_path})
+            if diagrams:
+                st.session_state.messages.append({"role": "assistant", "content": response, "diagram": diagrams[-1]})
             else:
                 st.session_state.messages.append({"role": "assistant", "content": response})
 
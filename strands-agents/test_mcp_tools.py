@@ -1,45 +1,193 @@
 #!/usr/bin/env python3
 """
 Test MCP Tools Loading and Diagram Generation
+
+Benchmark harness for the diagram MCP tools, called directly without an
+LLM: server handshake, load_tools (cold and from the schema cache), and
+generate_diagram latency and throughput at a given concurrency, compared
+with rendering through DiagramGenerator in-process. Results are printed
+as JSON so releases can be compared.
+
+    python test_mcp_tools.py --server stub --calls 20 --concurrency 4 --output mcp.json
+    python test_mcp_tools.py --server real
+    python test_mcp_tools.py --agent   # original end-to-end check through a Nova Premier agent
 """
 
+import argparse
 import asyncio
+import json
 import logging
-from mcp_diagram_client import get_diagram_mcp_client
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from mcp import stdio_client, StdioServerParameters
+from strands.tools.mcp import MCPClient
+from mcp_diagram_client import CachedSchemaMCPClient, get_diagram_mcp_client, server_command
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
-async def test_diagram_generation(tools):
-    """Test generate_diagram tool with sample input"""
-    print("\n" + "="*60)
-    print("Testing Diagram Generation")
-    print("="*60)
-    
-    test_code = '''
+TEST_CODE = '''
 from diagrams import Diagram
 from diagrams.aws.compute import Lambda
 from diagrams.aws.network import APIGateway
 from diagrams.aws.database import Dynamodb
 
-with Diagram("Simple Serverless", show=False, filename="test_serverless"):
+with Diagram("{title}", show=False):
     api = APIGateway("API")
     lambda_fn = Lambda("Function")
     db = Dynamodb("Database")
-    
+
     api >> lambda_fn >> db
 '''
-    
+
+def serve_stub():
+    """Minimal diagram MCP server that renders with DiagramGenerator (run as a subprocess)"""
+    try:
+        from mcp.server.mcpserver import MCPServer
+    except ImportError:  # mcp 1.x
+        from mcp.server.fastmcp import FastMCP as MCPServer
+    from diagram_generator import DiagramGenerator
+
+    server = MCPServer("diagram-stub")
+    generators = {}
+
+    @server.tool()
+    async def generate_diagram(code: str, workspace_dir: str = "", filename: str = "") -> str:
+        """Generate a diagram from diagrams code"""
+        generator = generators.setdefault(workspace_dir, DiagramGenerator(workspace_dir or "diagrams"))
+        # Off the server's event loop so concurrent calls render concurrently
+        return await asyncio.to_thread(generator.generate_diagram, code, filename=filename or None)
+
+    server.run()
+
+def summarize(latencies: List[float], wall: float, errors: int) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] if latencies else None
+    return {
+        "calls": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        "throughput_per_s": round(len(latencies) / wall, 2) if wall else None,
+    }
+
+def server_params(server: str) -> StdioServerParameters:
+    if server == "stub":
+        # The stub renders with this process's DIAGRAM_* settings and import path
+        return StdioServerParameters(command=sys.executable, args=[__file__, "--serve-stub"], env=dict(os.environ))
+    command, args, _ = server_command()
+    return StdioServerParameters(command=command, args=args)
+
+async def bench_mcp(params: StdioServerParameters, calls: int, concurrency: int, workspace: str) -> Dict[str, Any]:
+    """Handshake, tool listing and concurrent generate_diagram calls over one session"""
+    client = MCPClient(lambda: stdio_client(params), startup_timeout=120)
+    start = time.perf_counter()
+    client.start()
+    handshake = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        tools = client.list_tools_sync()
+        list_tools = time.perf_counter() - start
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def call(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                result = await client.call_tool_async(
+                    f"bench-{i}", "generate_diagram",
+                    {"code": TEST_CODE.format(title=f"Bench {uuid.uuid4().hex[:8]}"),
+                     "workspace_dir": workspace, "filename": f"mcp_bench_{i}"})
+                if result.get("status") == "success":
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        # One warm-up call so server-side worker start-up is not charged to the first call
+        await call(-1)
+        latencies.clear()
+        errors = 0
+        start = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(calls)))
+        wall = time.perf_counter() - start
+    finally:
+        client.stop(None, None, None)
+    return {"handshake_s": round(handshake, 3), "list_tools_s": round(list_tools, 3),
+            "tools": [tool.tool_name for tool in tools], **summarize(latencies, wall, errors)}
+
+async def bench_load_tools(params: StdioServerParameters) -> Dict[str, Any]:
+    """load_tools with an empty schema cache (includes the handshake) and with a warm one"""
+    results = {}
+    version_hash = f"bench-{uuid.uuid4().hex}"
+    with tempfile.TemporaryDirectory(prefix="mcp-schema-") as cache_dir:
+        for name in ("cold", "cached"):
+            client = CachedSchemaMCPClient(lambda: stdio_client(params), version_hash,
+                                           cache_dir=cache_dir, startup_timeout=120)
+            start = time.perf_counter()
+            await client.load_tools()
+            results[f"load_tools_{name}_s"] = round(time.perf_counter() - start, 4)
+            # Let the background handshake finish before shutting the server down
+            client._wait_for_server()
+            client.stop(None, None, None)
+    return results
+
+def bench_direct(calls: int, concurrency: int, workspace: str) -> Dict[str, Any]:
+    """The same renders through an in-process DiagramGenerator"""
+    from diagram_generator import DiagramGenerator, shutdown_render_pool
+
+    generator = DiagramGenerator(workspace)
+    latencies, errors = [], 0
+
+    def call(i: int):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            generator.generate_diagram(TEST_CODE.format(title=f"Bench {uuid.uuid4().hex[:8]}"),
+                                       filename=f"direct_bench_{i}")
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            logger.warning(f"Direct render failed: {e}")
+            errors += 1
+
+    # One warm-up render so worker start-up is not charged to the first call
+    call(-1)
+    latencies.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(calls)))
+    wall = time.perf_counter() - start
+    shutdown_render_pool()
+    return summarize(latencies, wall, errors)
+
+async def test_diagram_generation(tools):
+    """Test generate_diagram tool with sample input"""
+    print("\n" + "="*60)
+    print("Testing Diagram Generation")
+    print("="*60)
+
+    test_code = TEST_CODE.format(title="Simple Serverless")
+
     print("\nTest Input:")
     print(test_code)
     print("\nGenerating diagram...")
-    
+
     try:
         generate_tool = next((t for t in tools if t.tool_name == 'generate_diagram'), None)
         if not generate_tool:
             print("\n[FAILED]: generate_diagram tool not found")
             return False
-        
+
         from strands import Agent
         temp_agent = Agent(tools=[generate_tool], model="us.amazon.nova-premier-v1:0")
         result = temp_agent(f"Generate a diagram with this code: {test_code}")
@@ -51,31 +199,53 @@ with Diagram("Simple Serverless", show=False, filename="test_serverless"):
         logger.error(f"Diagram generation failed: {e}", exc_info=True)
         return False
 
-async def main():
-    print("="*60)
-    print("MCP Tools Test Suite")
-    print("="*60)
-    
-    print("\n1. Loading MCP tools...")
+async def agent_check():
+    """Original end-to-end check: load the MCP tools and render through an LLM agent"""
     client = get_diagram_mcp_client()
     tools = await client.load_tools()
-    
-    print(f"\n2. Result: {len(tools)} tools loaded")
-    
+    print(f"{len(tools)} tools loaded: {', '.join(tool.tool_name for tool in tools)}")
     if tools:
-        print("\n3. Available tools:")
-        for i, tool in enumerate(tools, 1):
-            tool_name = getattr(tool, '_name', getattr(tool, 'tool_name', str(tool)))
-            print(f"   {i}. {tool_name}")
-    else:
-        print("\n3. No tools loaded")
+        await test_diagram_generation(tools)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the diagram MCP tools")
+    parser.add_argument("--server", choices=("stub", "real"), default="stub",
+                        help="stub: local server rendering with DiagramGenerator; real: the configured AWS server")
+    parser.add_argument("--calls", type=int, default=20, help="generate_diagram calls per path")
+    parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight at once")
+    parser.add_argument("--no-direct", action="store_true", help="Skip the in-process DiagramGenerator path")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--agent", action="store_true", help="Run the end-to-end agent check instead")
+    parser.add_argument("--serve-stub", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.agent:
+        await agent_check()
         return
-    
-    await test_diagram_generation(tools)
-    
-    print("\n" + "="*60)
-    print("Test Complete")
-    print("="*60)
+
+    params = server_params(args.server)
+    with tempfile.TemporaryDirectory(prefix="mcp-bench-") as workspace:
+        results = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "server": args.server,
+            "command": " ".join([params.command, *params.args]),
+            "concurrency": args.concurrency,
+            **await bench_load_tools(params),
+            "mcp": await bench_mcp(params, args.calls, args.concurrency, workspace),
+        }
+        if not args.no_direct:
+            results["direct"] = await asyncio.to_thread(bench_direct, args.calls, args.concurrency, workspace)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if "--serve-stub" in sys.argv:
+        serve_stub()
+    else:
+        asyncio.run(main())
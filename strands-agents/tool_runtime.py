@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tool Runtime
+Concurrent tool dispatch with ordered results, per-tool concurrency
+limits and timing instrumentation
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+from strands.hooks import AfterToolCallEvent, BeforeToolCallEvent, HookProvider, HookRegistry
+from strands.tools.executors import ConcurrentToolExecutor
+from metrics import TOOL_SECONDS
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+DEFAULT_TOOL_CONCURRENCY = int(os.getenv("TOOL_DEFAULT_CONCURRENCY", "8"))
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """Parse "search_memory=4,save_memory=2" into a dict"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+# Per-tool caps on simultaneous blocking calls (across all agents)
+TOOL_CONCURRENCY_LIMITS = _parse_limits(os.getenv(
+    "TOOL_CONCURRENCY_LIMITS", "search_memory=4,save_memory=2,get_user_preferences=4,s3_inventory=2"))
+
+_io_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool-io")
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+class ToolLimiter:
+    """
+    Async semaphore shared by every event loop in the process
+
+    Each agent invocation runs its own event loop, so an asyncio.Semaphore
+    cannot cap calls across agents. Waiters park as futures on their own
+    loop and a released slot is handed to the oldest one thread-safely.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                try:
+                    waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+                except RuntimeError:  # waiter's loop is closed
+                    continue
+                waiter.granted = True
+                return
+            self._active -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+_limiters: Dict[str, ToolLimiter] = {}
+_limiter_lock = threading.Lock()
+
+
+def _limiter(tool_name: str) -> ToolLimiter:
+    limiter = _limiters.get(tool_name)
+    if limiter is None:
+        with _limiter_lock:
+            limiter = _limiters.setdefault(tool_name, ToolLimiter(
+                TOOL_CONCURRENCY_LIMITS.get(tool_name, DEFAULT_TOOL_CONCURRENCY)))
+    return limiter
+
+
+def io_queue_depth() -> int:
+    """Blocking tool calls waiting for an I/O worker"""
+    return _io_executor._work_queue.qsize()
+
+
+def _run_traced(tool_name: str, wait_s: float, fn: Callable, *args, **kwargs) -> Any:
+    with span("tool.io", tool=tool_name, wait_s=wait_s):
+        return fn(*args, **kwargs)
+
+
+async def run_io(tool_name: str, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking call for an async tool on the shared I/O executor
+
+    The per-tool limit is taken before dispatch, so calls over the limit
+    wait on the event loop instead of holding an I/O worker. The caller's
+    context is copied so spans opened in the worker nest under the tool's span.
+    """
+    loop = asyncio.get_running_loop()
+    queued = time.perf_counter()
+    async with _limiter(tool_name):
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_io_executor, functools.partial(
+            context.run, _run_traced, tool_name, round(time.perf_counter() - queued, 4), fn, *args, **kwargs))
+
+
+class ToolTimings:
+    """Running per-tool call counts and durations"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool_name: str, seconds: float, error: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {"calls": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total_s"] += seconds
+            stats["max_s"] = max(stats["max_s"], seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Copy of the stats with mean duration added"""
+        with self._lock:
+            return {
+                name: {**stats, "mean_s": stats["total_s"] / stats["calls"]}
+                for name, stats in self._stats.items()
+            }
+
+
+tool_timings = ToolTimings()
+
+
+class ToolTimingHook(HookProvider):
+    """Time every tool call through the agent hook events"""
+
+    def __init__(self, timings: ToolTimings = tool_timings):
+        self.timings = timings
+        self._starts: Dict[str, float] = {}
+
+    def register_hooks(self, registry: HookRegistry, **kwargs) -> None:
+        registry.add_callback(BeforeToolCallEvent, self._before_tool)
+        registry.add_callback(AfterToolCallEvent, self._after_tool)
+
+    def _before_tool(self, event: BeforeToolCallEvent) -> None:
+        self._starts[event.tool_use["toolUseId"]] = time.perf_counter()
+
+    def _after_tool(self, event: AfterToolCallEvent) -> None:
+        start = self._starts.pop(event.tool_use["toolUseId"], None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        error = event.exception is not None or (event.result or {}).get("status") == "error"
+        self.timings.record(event.tool_use["name"], seconds, error)
+        TOOL_SECONDS.labels(tool=event.tool_use["name"], status="error" if error else "success").observe(seconds)
+        logger.debug(f"Tool {event.tool_use['name']} took {seconds * 1000:.1f} ms")
+
+
+class OrderedConcurrentToolExecutor(ConcurrentToolExecutor):
+    """Run a model step's tool calls concurrently but report results in request order"""
+
+    async def _execute(self, agent, tool_uses, tool_results, *args, **kwargs):
+        async for event in super()._execute(agent, tool_uses, tool_results, *args, **kwargs):
+            yield event
+
+        order = {tool_use["toolUseId"]: i for i, tool_use in enumerate(tool_uses)}
+        tool_results.sort(key=lambda result: order.get(result["toolUseId"], len(order)))
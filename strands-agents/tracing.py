@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+OpenTelemetry Tracing
+Spans for chat requests, tools, Mem0, Nova and diagram rendering. The
+Strands agent loop emits its own spans (invocation, cycles, model and tool
+calls) under whatever span is current, so everything lands in one trace.
+Tracing is a no-op when TRACING_ENABLED=false or the SDK is not installed.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:
+    trace = None
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true" and trace is not None
+# Comma-separated: console, file, otlp
+TRACING_EXPORTERS = os.getenv("TRACING_EXPORTERS", "file")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+# Head sampling: fraction of traces recorded at all
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+# Tail sampling: recorded traces are exported when slower than the threshold,
+# otherwise with this probability
+TRACE_SLOW_THRESHOLD = float(os.getenv("TRACE_SLOW_THRESHOLD", "10"))
+TRACE_FAST_SAMPLE_RATIO = float(os.getenv("TRACE_FAST_SAMPLE_RATIO", "1.0"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "strands-memory-agent")
+
+
+if trace is not None:
+    class TailSamplingSpanProcessor(SpanProcessor):
+        """
+        Buffer each trace's spans until its local root ends, then export the
+        whole trace if it was slow (or wins the fast-trace lottery)
+        """
+
+        def __init__(self, delegate: SpanProcessor, slow_threshold: float, fast_ratio: float,
+                     max_traces: int = 1000):
+            self.delegate = delegate
+            self.slow_threshold_ns = int(slow_threshold * 1e9)
+            self.fast_ratio = fast_ratio
+            self.max_traces = max_traces
+            self._traces: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+            self._lock = threading.Lock()
+
+        def on_start(self, span, parent_context=None):
+            pass
+
+        def on_end(self, span: ReadableSpan):
+            trace_id = span.context.trace_id
+            with self._lock:
+                spans = self._traces.setdefault(trace_id, [])
+                spans.append(span)
+                is_root = span.parent is None or span.parent.is_remote
+                if is_root:
+                    del self._traces[trace_id]
+                elif len(self._traces) > self.max_traces:
+                    # Drop the oldest unfinished trace rather than grow without bound
+                    self._traces.popitem(last=False)
+            if not is_root:
+                return
+            duration = span.end_time - span.start_time
+            if duration >= self.slow_threshold_ns or random.random() < self.fast_ratio:
+                for buffered in spans:
+                    self.delegate.on_end(buffered)
+
+        def shutdown(self):
+            self.delegate.shutdown()
+
+        def force_flush(self, timeout_millis: int = 30000) -> bool:
+            return self.delegate.force_flush(timeout_millis)
+
+
+def _json_line(span) -> str:
+    return json.dumps(json.loads(span.to_json())) + "\n"
+
+
+def _exporters():
+    exporters = []
+    for name in filter(None, (part.strip() for part in TRACING_EXPORTERS.split(","))):
+        if name == "console":
+            exporters.append(ConsoleSpanExporter())
+        elif name == "file":
+            exporters.append(ConsoleSpanExporter(out=open(TRACING_FILE, "a"), formatter=_json_line))
+        elif name == "otlp":
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                exporters.append(OTLPSpanExporter())
+            except ImportError:
+                logger.warning("opentelemetry-exporter-otlp is not installed; skipping OTLP export")
+        else:
+            logger.warning(f"Unknown trace exporter: {name}")
+    return exporters
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def configure_tracing() -> bool:
+    """Install the tracer provider once per process; returns whether tracing is on"""
+    global _configured
+    if not TRACING_ENABLED:
+        return False
+    with _configure_lock:
+        if _configured:
+            return True
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": SERVICE_NAME}),
+            sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATIO)))
+        for exporter in _exporters():
+            provider.add_span_processor(TailSamplingSpanProcessor(
+                BatchSpanProcessor(exporter), TRACE_SLOW_THRESHOLD, TRACE_FAST_SAMPLE_RATIO))
+        trace.set_tracer_provider(provider)
+        _configured = True
+        logger.info(f"Tracing enabled (exporters: {TRACING_EXPORTERS}, sample ratio: {TRACE_SAMPLE_RATIO})")
+        return True
+
+
+def _attributes(attributes: Dict) -> Dict:
+    # OpenTelemetry only accepts primitive attribute values
+    return {key: value if isinstance(value, (str, bool, int, float)) else str(value)
+            for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a child span of the current one; yields None when tracing is off"""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    with trace.get_tracer(__name__).start_as_current_span(name, attributes=_attributes(attributes)) as current:
+        yield current
+
+
+def traced(name: str = None, **attributes):
+    """Decorator form of span() for sync and async functions"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+configure_tracing()